@@ -0,0 +1,35 @@
+import sys
+import time
+import random
+import lcpure
+
+pwgen = lcpure.load("pwgen")
+
+
+# microbenchmark of the password generators
+#
+# usage:  python bench_passwords.py [bits] [seconds]
+#
+# Each generator draws from its own SystemRandom as in
+# get_api_password_generate.
+
+bits = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+
+generators = {
+    "pronounciable": pwgen.pronounciable,
+    "words": pwgen.words,
+    "random": pwgen.random_pword,
+    "alphanumeric": pwgen.alphanumeric,
+}
+
+for mode, generator in generators.items():
+    rng = random.SystemRandom()
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(100):
+            generator(bits, rng=rng)
+        count += 100
+    elapsed = time.perf_counter() - start
+    print(f"{mode:>14}: {count / elapsed:10.0f} passwords/second ({bits} bits)")
@@ -1,5 +1,7 @@
 import urllib.request
-import subprocess
+import lcpure
+
+word_list = lcpure.load("word_list")
 
 
 # build password data
@@ -16,11 +18,5 @@ for wline in words_txt.split("\n"):
     else:
         words.append(wline.strip())
 
-with open("lcserver/word_list.py", "w") as ff:
-    ff.write(
-        "# This list is compiled from https://github.com/first20hours/google-10000-english\n"
-    )
-    ff.write("WORD_LIST = ")
-    ff.write(repr(words))
-
-subprocess.run(["black", "lcserver/word_list.py"])
+with open(word_list.DATA_FILE, "wb") as ff:
+    ff.write(word_list.pack(words))
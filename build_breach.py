@@ -0,0 +1,40 @@
+import re
+import sys
+import lcpure
+
+breach = lcpure.load("breach")
+
+
+# build the breached password filter
+#
+# usage:  python build_breach.py corpus.txt breach.bloom [fp_rate]
+#
+# The corpus is one entry per line, either a plain password or a hex SHA-1
+# digest optionally followed by :count (the Have I Been Pwned download
+# format).  Point LMS_CONTACTS_BREACH_FILTER at the output file.
+
+hex_line = re.compile("^([0-9A-Fa-f]{40})(:[0-9]+)?$")
+
+
+def corpus_digests(path):
+    with open(path, encoding="utf8", errors="replace") as ff:
+        for line in ff:
+            line = line.rstrip("\r\n")
+            if line == "":
+                continue
+            match = hex_line.match(line)
+            if match:
+                yield bytes.fromhex(match.group(1))
+            else:
+                yield breach.sha1_digest(line)
+
+
+corpus, output = sys.argv[1:3]
+fp_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.001
+
+# two passes so that a large corpus is never held in memory
+count = sum(1 for _ in corpus_digests(corpus))
+breach.build(output, corpus_digests(corpus), count, fp_rate)
+
+m, k = breach.filter_size(count, fp_rate)
+print(f"{count} entries, {m // 8} bytes, {k} hashes written to {output}")
@@ -23,8 +23,9 @@ else
 	exit
 fi
 
-COVERAGE_PROCESS_START=.coveragerc pytest tests
+# end-to-end.py initializes the database which the pytest tests run against
 COVERAGE_PROCESS_START=.coveragerc python tests/end-to-end.py
+COVERAGE_PROCESS_START=.coveragerc pytest tests
 coverage combine
 coverage report
 if [ ]; then
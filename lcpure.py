@@ -0,0 +1,24 @@
+import os
+import sys
+import importlib.util
+
+# The build and benchmark scripts use the pure python modules of lcserver
+# (breach, pwgen and word_list).  Importing them through the package would
+# run lcserver/__init__.py which loads the yenot endpoints, so the package
+# is registered here without running it.
+
+LCSERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lcserver")
+
+
+def load(name):
+    """
+    Return the module lcserver.<name> without running lcserver/__init__.py.
+    """
+    if "lcserver" not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            "lcserver",
+            os.path.join(LCSERVER, "__init__.py"),
+            submodule_search_locations=[LCSERVER],
+        )
+        sys.modules["lcserver"] = importlib.util.module_from_spec(spec)
+    return importlib.import_module(f"lcserver.{name}")
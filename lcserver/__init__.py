@@ -2,3 +2,5 @@ from . import contacts
 from . import tags
 from . import reports
 from . import passwords
+from . import keys
+from . import rotation
@@ -0,0 +1,105 @@
+import os
+import mmap
+import math
+import struct
+import hashlib
+import threading
+
+# A Bloom filter of the SHA-1 digests of breached passwords.  The file is a
+# header (magic, bit count m, hash count k) followed by the m bit array.
+# build_breach.py writes it from a local breach corpus and the server maps it
+# read only; LMS_CONTACTS_BREACH_FILTER names the file.  Without it the check
+# is disabled.
+
+MAGIC = b"LCBLOOM1"
+HEADER = struct.Struct("<8sQI4x")
+
+FILTER_VAR = "LMS_CONTACTS_BREACH_FILTER"
+
+
+def sha1_digest(password):
+    return hashlib.sha1(password.encode("utf8")).digest()
+
+
+def _positions(digest, m, k):
+    # double hashing (Kirsch-Mitzenmacher) from the two halves of the digest
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:16], "little") | 1
+    return [(h1 + i * h2) % m for i in range(k)]
+
+
+def filter_size(count, fp_rate):
+    """
+    Return the bit count m and hash count k of a filter for count entries
+    with false positive rate fp_rate.
+
+    >>> filter_size(1000, 0.001)
+    (14378, 10)
+    """
+    m = math.ceil(-count * math.log(fp_rate) / math.log(2) ** 2)
+    k = max(1, round(m / count * math.log(2)))
+    return m, k
+
+
+def build(path, digests, count, fp_rate=0.001):
+    """
+    Write a filter to path from an iterable of SHA-1 digests with count
+    entries.
+    """
+    m, k = filter_size(max(count, 1), fp_rate)
+    bits = bytearray((m + 7) // 8)
+    for digest in digests:
+        for p in _positions(digest, m, k):
+            bits[p >> 3] |= 1 << (p & 7)
+
+    with open(path, "wb") as ff:
+        ff.write(HEADER.pack(MAGIC, m, k))
+        ff.write(bits)
+
+
+class BreachFilter:
+    def __init__(self, path):
+        with open(path, "rb") as ff:
+            self.map = mmap.mmap(ff.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.m, self.k = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a breached password filter")
+        self.offset = HEADER.size
+
+    def contains_digest(self, digest):
+        for p in _positions(digest, self.m, self.k):
+            if not self.map[self.offset + (p >> 3)] & (1 << (p & 7)):
+                return False
+        return True
+
+    def __contains__(self, password):
+        return self.contains_digest(sha1_digest(password))
+
+
+_lock = threading.Lock()
+_filter = None
+_loaded = False
+
+
+def breach_filter():
+    """
+    Return the process wide BreachFilter or None if no filter is configured.
+    """
+    global _filter, _loaded
+
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                path = os.environ.get(FILTER_VAR, None)
+                _filter = BreachFilter(path) if path else None
+                _loaded = True
+    return _filter
+
+
+def is_breached(password):
+    """
+    Return True if password is (with the filter's false positive rate) in
+    the breach corpus.
+    """
+    bf = breach_filter()
+    return bf is not None and password in bf
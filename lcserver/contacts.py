@@ -1,12 +1,26 @@
-import os
+import re
 import uuid
 import json
-import cryptography.fernet
+import base64
+import urllib.parse
 import rtlib
 import yenot.backend.api as api
+from . import keys
+from . import breach
 
 app = api.get_global_app()
 
+# bit columns maintained by the server and neither shown to nor accepted from
+# the client
+bit_server_columns = [
+    "bit_sequence",
+    "number_digits",
+    "url_host_rev",
+    "password_key_id",
+    "data_key_id",
+    "password_fingerprint",
+]
+
 
 def _raise_unmatched_share(conn, persona_id):
     select = """
@@ -40,19 +54,218 @@ def _raise_unmatched_owner(conn, persona_id, allow_new=False):
         raise api.UserError("user-not-owner", "Only the owner may edit this persona.")
 
 
-def fernet_keyed():
-    def _fernet(envkey):
-        key = os.environ[envkey]
-        return cryptography.fernet.Fernet(key.encode("ascii"))
+def _raise_unmatched_owners(conn, persona_ids):
+    select = """
+select count(*)
+from contacts.personas
+where personas.id=any(%(pids)s::uuid[]) and personas.owner_id=%(uid)s
+"""
+
+    active = api.active_user(conn)
+    pids = list(set(persona_ids))
+    count = api.sql_1row(conn, select, {"pids": pids, "uid": active.id})
+
+    if count != len(pids):
+        raise api.UserError("user-not-owner", "Only the owner may edit these personas.")
+
+
+def _refresh_persona_search(conn, persona_id):
+    # Keep the stored (and gin indexed) search vectors in sync with the
+    # persona.  The search_document weights persona fields above bit text.
+    update = """
+with persona as (
+    select id,
+        to_tsvector(coalesce(l_name, ''))||
+        to_tsvector(coalesce(f_name, ''))||
+        to_tsvector(coalesce(organization, ''))||
+        to_tsvector(coalesce(title, ''))||
+        to_tsvector(coalesce(memo, '')) as fts_search
+    from contacts.personas
+    where id=%(pid)s
+), bitfts as (
+    select contacts.tsvector_agg(bits.fts_search) as fts_search
+    from contacts.bits
+    where bits.persona_id=%(pid)s
+)
+update contacts.personas set
+    fts_search=persona.fts_search,
+    search_document=setweight(persona.fts_search, 'A')||
+        setweight(coalesce(bitfts.fts_search, ''), 'B')
+from persona, bitfts
+where personas.id=persona.id"""
+
+    api.sql_void(conn, update, {"pid": persona_id})
+
+
+def normalize_phone(number):
+    """
+    Reduce a free-form phone number to E.164 style digits (without the +).
+    Ten digit numbers are taken to be North American.
+
+    >>> normalize_phone("(717) 555-1212")
+    '17175551212'
+    >>> normalize_phone("+44 20 7946 0958")
+    '442079460958'
+    >>> normalize_phone("011 44 20 7946 0958")
+    '442079460958'
+    >>> normalize_phone("555-1212")
+    '5551212'
+    >>> normalize_phone("ext") is None
+    True
+    """
+    if number is None:
+        return None
+    digits = re.sub(r"\D", "", number)
+    if digits == "":
+        return None
+    if number.strip().startswith("+"):
+        return digits
+    if digits.startswith("011"):
+        return digits[3:]
+    if len(digits) == 10:
+        return "1" + digits
+    return digits
+
+
+def url_host_reversed(url):
+    """
+    Return the host of url with its labels reversed (and any leading www.
+    dropped) so that a domain and all of its sub-domains share a prefix.
+
+    >>> url_host_reversed("https://www.Example.com/login")
+    'com.example'
+    >>> url_host_reversed("login.example.com:8443/path")
+    'com.example.login'
+    >>> url_host_reversed("") is None
+    True
+    >>> url_host_reversed("http://[::1") is None
+    True
+    """
+    if url in ["", None]:
+        return None
+    if not re.match(r"^[a-z][a-z0-9+.-]*://", url, re.IGNORECASE):
+        url = "//" + url
+    try:
+        host = urllib.parse.urlsplit(url).hostname
+    except ValueError:
+        # malformed (for instance an unclosed ipv6 bracket); any url text is
+        # accepted so it is stored without a host
+        return None
+    if not host:
+        return None
+    if host.startswith("www."):
+        host = host[4:]
+    return ".".join(reversed(host.split(".")))
+
+
+# persona filters on tag_id=%(tag)s
+TAG_FILTER = """exists (
+    select 1 from contacts.tagpersona
+    where tagpersona.tag_id=%(tag)s and tagpersona.persona_id=personas.id)"""
+TAG_DESCENDANTS_FILTER = """exists (
+    select 1 from contacts.tagpersona
+    join contacts.tag_closure on tag_closure.descendant_id=tagpersona.tag_id
+    where tag_closure.ancestor_id=%(tag)s and tagpersona.persona_id=personas.id)"""
+
+
+def _apply_tag_deltas(conn, adds, removes):
+    # adds and removes are lists of (tag_id, persona_id) pairs; each is
+    # applied with one statement and repeating a delta is harmless
+    insert_adds = """
+insert into contacts.tagpersona (tag_id, persona_id)
+select unnest(%(tags)s::uuid[]), unnest(%(pers)s::uuid[])
+on conflict (tag_id, persona_id) do nothing"""
+
+    delete_removes = """
+delete from contacts.tagpersona
+using (
+    select unnest(%(tags)s::uuid[]) as tag_id,
+        unnest(%(pers)s::uuid[]) as persona_id) removes
+where tagpersona.tag_id=removes.tag_id
+    and tagpersona.persona_id=removes.persona_id"""
+
+    if len(adds) > 0:
+        params = {"tags": [a[0] for a in adds], "pers": [a[1] for a in adds]}
+        api.sql_void(conn, insert_adds, params)
+    if len(removes) > 0:
+        params = {"tags": [r[0] for r in removes], "pers": [r[1] for r in removes]}
+        api.sql_void(conn, delete_removes, params)
+
+
+# largest page of get_api_personas_list
+LIST_MAX_LIMIT = 1000
+# most matches of get_api_personas_list in relevance order; the bounded top-k
+# sort relies on this staying small
+RELEVANCE_MAX_TOP = 100
+
+
+def _count_param(value, name, maximum, minimum=1):
+    """
+    Return the integer query parameter value (at least minimum) capped at
+    maximum.
+
+    >>> _count_param("20", "limit", 50), _count_param(80, "limit", 50)
+    (20, 50)
+    >>> _count_param("0", "days", 3650, minimum=0)
+    0
+    """
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        count = None
+    if count is None or count < minimum:
+        if minimum == 1:
+            message = f"{name} must be a positive integer"
+        else:
+            message = f"{name} must be an integer of at least {minimum}"
+        raise api.UserError("invalid-param", message)
+    return min(count, maximum)
+
+
+def _parse_uuids(values, name):
+    """
+    Return the distinct ids of values in canonical form.
+
+    >>> _parse_uuids(["{0F8FAD5B-D9CB-469F-A165-70867728950E}"], "ids")
+    ['0f8fad5b-d9cb-469f-a165-70867728950e']
+    """
+    try:
+        parsed = {str(uuid.UUID(str(v))) for v in values}
+    except ValueError:
+        raise api.UserError("invalid-param", f"{name} must be a list of ids")
+    return sorted(parsed)
+
+
+def _keyset_token(entity_name, persona_id):
+    # opaque page cursor for the (entity_name, id) sort key of the persona list
+    raw = json.dumps([entity_name, str(persona_id)]).encode("utf8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
 
-    basekey = "LMS_CONTACTS_KEY"
-    fernetbase = _fernet(basekey)
-    rotated = [f"{basekey}_ROTATE{i+1}" for i in range(3)]
-    ferns = [_fernet(rkey) for rkey in rotated if rkey in os.environ]
 
-    print(f"Returning MultiFernet with {len(ferns)} rotated keys")
+def _keyset_parse(token):
+    """
+    Return the (entity_name, persona_id) of a token of _keyset_token.
 
-    return cryptography.fernet.MultiFernet([fernetbase, *ferns])
+    >>> _keyset_parse(_keyset_token("Teach, Edward", uuid.UUID(int=1)))
+    ('Teach, Edward', '00000000-0000-0000-0000-000000000001')
+    """
+    try:
+        value = json.loads(base64.urlsafe_b64decode(token))
+        if not isinstance(value, list) or len(value) != 2:
+            raise ValueError(token)
+        entity_name, persona_id = value
+        if not isinstance(entity_name, str) or not isinstance(persona_id, str):
+            raise ValueError(token)
+        persona_id = str(uuid.UUID(persona_id))
+    except (ValueError, TypeError):
+        raise api.UserError("invalid-param", "The after token is not valid.")
+    return entity_name, persona_id
+
+
+def fernet_keyed(conn):
+    # per request envelope encryption with the owners' data keys; unwrapped
+    # data keys are cached for the life of the returned object
+    return keys.DataKeys(conn)
 
 
 @app.get("/api/personas/owner-list", name="get_api_personas_owner_list")
@@ -81,52 +294,68 @@ def get_api_personas_list_prompts():
     return api.PromptList(
         frag=api.cgen.basic(label="Search"),
         tag_id=api.cgen.contact_tag.id(label="Tag"),
-        __order__=["frag", "tag_id"],
+        include_descendants=api.cgen.boolean(label="Include Sub-tags"),
+        __order__=["frag", "tag_id", "include_descendants"],
     )
 
 
-@app.get(
-    "/api/personas/list",
-    name="get_api_personas_list",
-    report_prompts=get_api_personas_list_prompts,
-    report_title="Contact List",
-)
-def get_api_personas_list(request):
-    frag = request.query.get("frag", None)
-    included = request.query.get("included", None)
-    tag = request.query.get("tag_id", None)
-
+def _personas_list(
+    conn,
+    user_id,
+    frag=None,
+    included=None,
+    tag=None,
+    descendants=False,
+    after=None,
+    order="name",
+    limit=None,
+):
+    """
+    Return the (columns, rows) of the personas shared with user_id matching
+    the search frag (or in the ;-separated included ids) and tag.  The name
+    order pages from the keyset token after; the relevance order returns the
+    top limit matches of frag.
+    """
     select = """
 select personas.id,
     personas.entity_name,
     personas.corporate_entity,
     personas.l_name, personas.f_name, personas.title, personas.organization,
-    coalesce(users.full_name, users.username) as owner
+    coalesce(users.full_name, users.username) as owner/*RANK*/
 from contacts.personas_calc as personas
 join contacts.persona_shares pshare on pshare.persona_id=personas.id
 join users on users.id=personas.owner_id
 where /*WHERE*/
-order by personas.entity_name
+order by /*ORDER*/
+/*LIMIT*/
 """
 
-    params = {}
+    params = {"uid": user_id}
     wheres = []
     if frag not in ["", None] and included not in ["", None]:
         params["frag"] = api.sanitize_fts(frag)
         params["idlist"] = tuple(included.split(";"))
         wheres.append(
-            "(personas.fts_search @@ to_tsquery(%(frag)s) or personas.id in %(idlist)s)"
+            "(personas.search_document @@ to_tsquery(%(frag)s) or personas.id in %(idlist)s)"
         )
     elif frag in ["", None] and included not in ["", None]:
         params["idlist"] = tuple(included.split(";"))
         wheres.append("personas.id in %(idlist)s")
     elif frag not in ["", None] and included in ["", None]:
         params["frag"] = api.sanitize_fts(frag)
-        wheres.append("personas.fts_search @@ to_tsquery(%(frag)s)")
+        wheres.append("personas.search_document @@ to_tsquery(%(frag)s)")
     if tag not in ["", None]:
         params["tag"] = tag
+        # a semi-join on the tagpersona index (through the tag_closure index
+        # for sub-tags)
+        if descendants:
+            wheres.append(TAG_DESCENDANTS_FILTER)
+        else:
+            wheres.append(TAG_FILTER)
+    if after not in ["", None]:
+        params["after_name"], params["after_id"] = _keyset_parse(after)
         wheres.append(
-            "(select count(*) from contacts.tagpersona where tag_id=%(tag)s and persona_id=personas.id)>0"
+            "(personas.entity_name, personas.id) > (%(after_name)s, %(after_id)s)"
         )
 
     wheres.append("pshare.user_id=%(uid)s")
@@ -134,26 +363,149 @@ order by personas.entity_name
     if len(wheres) == 0:
         wheres.append("True")
     select = select.replace("/*WHERE*/", " and ".join(wheres))
+    if order == "relevance":
+        # The gin index narrows to the matches and the limit turns the sort
+        # into a bounded top-k heap sort rather than a sort of every match.
+        # Persona fields carry weight A and bit text weight B in
+        # search_document so ts_rank_cd favors matches on the persona itself.
+        select = select.replace(
+            "/*RANK*/",
+            ",\n    ts_rank_cd(personas.search_document, to_tsquery(%(frag)s)) as rank",
+        )
+        select = select.replace(
+            "/*ORDER*/", "rank desc, personas.entity_name, personas.id"
+        )
+    else:
+        select = select.replace("/*ORDER*/", "personas.entity_name, personas.id")
+    if limit is not None:
+        params["limit"] = limit
+        select = select.replace("/*LIMIT*/", "limit %(limit)s")
+
+    cm = api.ColumnMap(
+        id=api.cgen.lms_personas_persona.surrogate(),
+        corporate_entity=api.cgen.auto(hidden=True),
+        entity_name=api.cgen.lms_personas_persona.name(url_key="id", represents=True),
+        l_name=api.cgen.auto(hidden=True),
+        f_name=api.cgen.auto(hidden=True),
+        title=api.cgen.auto(hidden=True),
+    )
+    return api.sql_tab2(conn, select, params, cm)
+
+
+@app.get(
+    "/api/personas/list",
+    name="get_api_personas_list",
+    report_prompts=get_api_personas_list_prompts,
+    report_title="Contact List",
+)
+def get_api_personas_list(request):
+    frag = request.query.get("frag", None)
+    included = request.query.get("included", None)
+    tag = request.query.get("tag_id", None)
+    descendants = request.query.get("include_descendants", "false") in ("true", "1")
+    limit = request.query.get("limit", None)
+    after = request.query.get("after", None)
+    order = request.query.get("order", "name")
+    top = request.query.get("top", 50)
+
+    if order not in ("name", "relevance"):
+        raise api.UserError("invalid-param", "order must be one of name or relevance")
+    if order == "relevance" and frag in ["", None]:
+        raise api.UserError("invalid-param", "relevance order requires a search frag")
+    if order == "relevance" and after not in ["", None]:
+        raise api.UserError(
+            "invalid-param", "relevance order returns the top matches only"
+        )
+
+    if order == "relevance":
+        limit = _count_param(top, "top", RELEVANCE_MAX_TOP)
+    elif limit not in ["", None]:
+        limit = _count_param(limit, "limit", LIST_MAX_LIMIT)
+    else:
+        limit = None
 
     results = api.Results(default_title=True)
     with app.dbconn() as conn:
         active = api.active_user(conn)
-        params["uid"] = active.id
-
-        cm = api.ColumnMap(
-            id=api.cgen.lms_personas_persona.surrogate(),
-            corporate_entity=api.cgen.auto(hidden=True),
-            entity_name=api.cgen.lms_personas_persona.name(
-                url_key="id", represents=True
-            ),
-            l_name=api.cgen.auto(hidden=True),
-            f_name=api.cgen.auto(hidden=True),
-            title=api.cgen.auto(hidden=True),
+
+        columns, rows = _personas_list(
+            conn, active.id, frag, included, tag, descendants, after, order, limit
+        )
+
+        if order == "name" and limit is not None and len(rows) == limit:
+            last = rows[-1]
+            results.keys["after"] = _keyset_token(last.entity_name, last.id)
+
+        results.tables["personas", True] = columns, rows
+    return results.json_out()
+
+
+def _personas_typeahead(conn, user_id, frag, limit):
+    """
+    Return the (columns, rows) of the (at most limit) personas shared with
+    user_id best matching frag by name or organization.
+    """
+    # The match conditions are served by the trigram indexes on entity_name and
+    # organization; the prefix match covers fragments too short to reach the
+    # word similarity threshold.
+    select = """
+select personas.id,
+    personas.entity_name,
+    personas.organization,
+    greatest(
+        word_similarity(%(frag)s, personas.entity_name),
+        word_similarity(%(frag)s, coalesce(personas.organization, ''))) as similarity
+from contacts.personas_calc as personas
+join contacts.persona_shares pshare on pshare.persona_id=personas.id
+where /*WHERE*/
+order by similarity desc, personas.entity_name
+limit %(limit)s
+"""
+
+    escaped = frag.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    params = {"frag": frag, "prefix": f"{escaped}%", "limit": limit, "uid": user_id}
+    wheres = ["pshare.user_id=%(uid)s"]
+    if frag == "":
+        wheres.append("False")
+    else:
+        wheres.append(
+            """(%(frag)s <%% personas.entity_name
+        or %(frag)s <%% personas.organization
+        or personas.entity_name ilike %(prefix)s
+        or personas.organization ilike %(prefix)s)"""
+        )
+    select = select.replace("/*WHERE*/", " and ".join(wheres))
+
+    cm = api.ColumnMap(
+        id=api.cgen.lms_personas_persona.surrogate(),
+        entity_name=api.cgen.lms_personas_persona.name(url_key="id", represents=True),
+        similarity=api.cgen.auto(hidden=True),
+    )
+    return api.sql_tab2(conn, select, params, cm)
+
+
+@app.get("/api/personas/typeahead", name="get_api_personas_typeahead")
+def get_api_personas_typeahead(request):
+    frag = request.query.get("frag", "").strip()
+    limit = _count_param(request.query.get("limit", 10), "limit", 50)
+
+    results = api.Results()
+    with app.dbconn() as conn:
+        active = api.active_user(conn)
+        results.tables["personas", True] = _personas_typeahead(
+            conn, active.id, frag, limit
         )
-        results.tables["personas", True] = api.sql_tab2(conn, select, params, cm)
     return results.json_out()
 
 
+def _notify_personas(conn, persona_ids):
+    # A change to one persona notifies the personas channel with the payload
+    # {"id": ...}; the bulk endpoints notify {"ids": [...]} listing the
+    # changed persona ids.
+    payload = json.dumps({"ids": sorted({str(pid) for pid in persona_ids})})
+    api.notify_listener(conn, "personas", payload)
+
+
 @app.put("/api/personas/poll-changes", name="put_api_personas_poll_changes")
 def put_api_personas_poll_changes(request):
     return api.start_listener(request, "personas")
@@ -164,19 +516,88 @@ def get_api_personas_poll_changes(request):
     return api.poll_listener(request, "personas")
 
 
-def _get_api_persona(a_id=None, newrow=False):
-    select = """
-select personas.id, 
+def _decrypt_bit_data(f, bit_data):
+    # replace password_enc in the bit_data json of contacts.bits with the
+    # decrypted password
+    if "password_enc" in bit_data:
+        # the dictionary from postgres comes through with password_enc as a string
+        penc = bit_data["password_enc"]
+        if penc is None:
+            bit_data["password"] = None
+        else:
+            if penc[:2] != r"\x":
+                raise ValueError("expecting hex data prefixed by \\x")
+            penc = bytes.fromhex(penc[2:])
+            dkid = bit_data.get("data_key_id", None)
+            key_id = bit_data.get("password_key_id", None)
+            bit_data["password"] = f.decrypt(penc, dkid, key_id).decode("utf8")
+        del bit_data["password_enc"]
+        bit_data.pop("password_key_id", None)
+        bit_data.pop("data_key_id", None)
+
+
+def _mask_bit_data(bit_data):
+    # replace password_enc in the bit_data json of contacts.bits with a
+    # has_password flag; see get_api_persona_bit_password
+    if "password_enc" in bit_data:
+        bit_data["has_password"] = bit_data.pop("password_enc") is not None
+        bit_data.pop("password_key_id", None)
+        bit_data.pop("data_key_id", None)
+
+
+def _reveal_passwords(request):
+    # passwords=mask returns has_password flags in place of passwords
+    mode = request.query.get("passwords", "reveal")
+    if mode not in ("reveal", "mask"):
+        raise api.UserError("invalid-param", "passwords must be one of reveal or mask")
+    return mode == "reveal"
+
+
+# persona columns of the persona detail end-points; the query joins users for
+# the owner name
+PERSONA_COLUMNS = """personas.id,
     personas.entity_name,
     personas.corporate_entity,
     personas.l_name, personas.f_name, personas.title, personas.organization,
     personas.memo,
     personas.birthday, personas.anniversary,
     personas.owner_id,
-    coalesce(users.full_name, users.username) as owner_name,
+    coalesce(users.full_name, users.username) as owner_name"""
+
+
+# The data key of a url bit's password joined in to the bit queries so that
+# decrypting needs no query per data key.  See _prime_data_key.
+DATA_KEY_COLUMNS = """data_keys.id as dk_id, data_keys.owner_id as dk_owner_id,
+    data_keys.wrapped_key as dk_wrapped_key,
+    data_keys.master_key_id as dk_master_key_id"""
+DATA_KEY_NAMES = ["dk_id", "dk_owner_id", "dk_wrapped_key", "dk_master_key_id"]
+
+
+def _prime_data_key(f, row):
+    if row.dk_id is not None:
+        f.prime(row.dk_id, row.dk_owner_id, row.dk_wrapped_key, row.dk_master_key_id)
+
+
+def _persona_detail(conn, user_id, a_id=None, newrow=False, reveal=True):
+    """
+    Return the (columns, rows) of the persona and of its bits from a single
+    query.  The share check is the join on pshare_auth so a persona which is
+    not shared with user_id raises user-not-authorized without further
+    queries.
+    """
+    # The bits are left joined giving one row per bit (or one row with null
+    # bit columns); the persona columns repeat and are split off below.
+    select = """
+select /*PERSONA*/,
     shares.share_refs,
-    taglist.tag_ids
+    taglist.tag_ids,
+    bits.id as bit_id, bits.persona_id as bit_persona_id, bits.bit_type,
+    bits.name as bit_name, bits.memo as bit_memo, bits.is_primary as bit_is_primary,
+    bits.bit_data,
+    /*DATAKEY*/
 from contacts.personas_calc personas
+join contacts.persona_shares pshare_auth on pshare_auth.persona_id=personas.id
+    and pshare_auth.user_id=%(uid)s
 join users on users.id=personas.owner_id
 join lateral (
     select array_agg(tagpersona.tag_id::text) as tag_ids
@@ -190,80 +611,101 @@ join lateral (
     from contacts.persona_shares pshare
     join users u2 on u2.id=pshare.user_id
     where pshare.persona_id=personas.id) shares on true
-where /*WHERE*/"""
-
-    select_bits = """
-select id, persona_id, bit_type, 
-    name, memo, is_primary,
-    bit_data
-from contacts.bits
-where /*BWHERE*/
-order by bit_sequence"""
+left outer join contacts.bits on bits.persona_id=personas.id
+left outer join contacts.data_keys on data_keys.id=(bits.bit_data->>'data_key_id')::uuid
+where /*WHERE*/
+order by bits.bit_sequence"""
+
+    bit_columns = {
+        "bit_id": "id",
+        "bit_persona_id": "persona_id",
+        "bit_type": "bit_type",
+        "bit_name": "name",
+        "bit_memo": "memo",
+        "bit_is_primary": "is_primary",
+        "bit_data": "bit_data",
+    }
 
     wheres = []
-    bwheres = []
-    params = {}
+    params = {"uid": user_id}
     if a_id != None:
         params["i"] = a_id
         wheres.append("personas.id=%(i)s")
-        bwheres.append("bits.persona_id=%(i)s")
     if newrow:
         wheres.append("False")
-        bwheres.append("False")
 
     assert len(wheres) == 1
     select = select.replace("/*WHERE*/", wheres[0])
-    select_bits = select_bits.replace("/*BWHERE*/", bwheres[0])
+    select = select.replace("/*PERSONA*/", PERSONA_COLUMNS)
+    select = select.replace("/*DATAKEY*/", DATA_KEY_COLUMNS)
+
+    cm = api.ColumnMap(
+        entity_name=api.cgen.auto(skip_write=True),
+        owner_name=api.cgen.auto(skip_write=True),
+        share_refs=api.cgen.auto(skip_write=True),
+        tag_ids=api.cgen.auto(skip_write=True),
+    )
+    rawdata = api.sql_tab2(conn, select, params, cm)
 
-    results = api.Results()
-    with app.dbconn() as conn:
-        if not newrow:
-            _raise_unmatched_share(conn, a_id)
-
-        cm = api.ColumnMap(
-            entity_name=api.cgen.auto(skip_write=True),
-            owner_name=api.cgen.auto(skip_write=True),
-            share_refs=api.cgen.auto(skip_write=True),
-            tag_ids=api.cgen.auto(skip_write=True),
+    if not newrow and len(rawdata[1]) == 0:
+        raise api.UserError(
+            "user-not-authorized",
+            "This persona is not shared (or owned) by the active user.",
         )
-        columns, rows = api.sql_tab2(conn, select, params, cm)
 
-        if newrow:
+    def nothing(oldrow, row):
+        pass
 
-            def default_row(index, row):
-                row.id = str(uuid.uuid1())
+    columns = api.tab2_columns_transform(
+        rawdata[0], remove=[*bit_columns, *DATA_KEY_NAMES]
+    )
+    rows = api.tab2_rows_transform((rawdata[0], rawdata[1][:1]), columns, nothing)
+    persona = columns, rows
+
+    columns = [(bit_columns[c[0]], c[1]) for c in rawdata[0] if c[0] in bit_columns]
+    bitrows = [row for row in rawdata[1] if row.bit_id is not None]
+
+    # use the key to decrypt the password replacing column password_enc
+    # with password
+    f = fernet_keyed(conn)
+
+    def decrypt(oldrow, row):
+        for old, new in bit_columns.items():
+            setattr(row, new, getattr(oldrow, old))
+        if reveal:
+            _prime_data_key(f, oldrow)
+            _decrypt_bit_data(f, row.bit_data)
+        else:
+            _mask_bit_data(row.bit_data)
 
-            rows = api.tab2_rows_default(columns, [None], default_row)
+    rows = api.tab2_rows_transform((rawdata[0], bitrows), columns, decrypt)
+    bits = columns, rows
 
-        results.tables["persona", True] = columns, rows
-        bit_colrows = api.sql_tab2(conn, select_bits, params)
+    return persona, bits
 
-        # use the key to decrypt the password replacing column password_enc
-        # with password
-        f = fernet_keyed()
 
-        def decrypt(oldrow, row):
-            if "password_enc" in oldrow.bit_data:
-                # the dictionary from postgres comes through with password_enc as a string
-                penc = oldrow.bit_data["password_enc"]
-                if penc is None:
-                    row.bit_data["password"] = None
-                else:
-                    if penc[:2] != r"\x":
-                        raise ValueError("expecting hex data prefixed by \\x")
-                    penc = bytes.fromhex(penc[2:])
-                    row.bit_data["password"] = f.decrypt(penc).decode("utf8")
-                del row.bit_data["password_enc"]
+def _get_api_persona(a_id=None, newrow=False, reveal=True):
+    results = api.Results()
+    with app.dbconn() as conn:
+        active = api.active_user(conn)
+        persona, bits = _persona_detail(conn, active.id, a_id, newrow, reveal)
+
+        if newrow:
 
-        rows = api.tab2_rows_transform(bit_colrows, bit_colrows[0], decrypt)
+            def default_row(index, row):
+                row.id = str(uuid.uuid1())
 
-        results.tables["bits"] = bit_colrows[0], rows
+            columns = persona[0]
+            persona = columns, api.tab2_rows_default(columns, [None], default_row)
+
+        results.tables["persona", True] = persona
+        results.tables["bits"] = bits
     return results
 
 
 @app.get("/api/persona/<a_id>", name="get_api_persona")
-def get_api_persona(a_id):
-    results = _get_api_persona(a_id)
+def get_api_persona(request, a_id):
+    results = _get_api_persona(a_id, reveal=_reveal_passwords(request))
     return results.json_out()
 
 
@@ -274,6 +716,85 @@ def get_api_persona_new():
     return results.json_out()
 
 
+@app.post("/api/personas/batch", name="post_api_personas_batch")
+def post_api_personas_batch(request):
+    personas = api.table_from_tab2("personas", required=["id"])
+    reveal = _reveal_passwords(request)
+
+    ids = _parse_uuids([row.id for row in personas.rows], "personas")
+
+    select_unshared = """
+select count(*)
+from contacts.persona_shares pshare
+where pshare.user_id=%(uid)s and pshare.persona_id=any(%(ids)s::uuid[])
+"""
+
+    select = """
+select /*PERSONA*/
+from contacts.personas_calc personas
+join users on users.id=personas.owner_id
+where personas.id=any(%(ids)s::uuid[])
+order by personas.entity_name, personas.id"""
+    select = select.replace("/*PERSONA*/", PERSONA_COLUMNS)
+
+    select_bits = """
+select bits.id, bits.persona_id, bits.bit_type,
+    bits.name, bits.memo, bits.is_primary,
+    bits.bit_data,
+    /*DATAKEY*/
+from contacts.bits
+left outer join contacts.data_keys on data_keys.id=(bits.bit_data->>'data_key_id')::uuid
+where bits.persona_id=any(%(ids)s::uuid[])
+order by bits.persona_id, bits.bit_sequence"""
+    select_bits = select_bits.replace("/*DATAKEY*/", DATA_KEY_COLUMNS)
+
+    select_tags = """
+select tagpersona.persona_id, tagpersona.tag_id
+from contacts.tagpersona
+where tagpersona.persona_id=any(%(ids)s::uuid[])"""
+
+    select_shares = """
+select pshare.persona_id, pshare.user_id,
+    coalesce(users.full_name, users.username) as name
+from contacts.persona_shares pshare
+join users on users.id=pshare.user_id
+where pshare.persona_id=any(%(ids)s::uuid[])"""
+
+    results = api.Results()
+    with app.dbconn() as conn:
+        active = api.active_user(conn)
+        params = {"ids": ids, "uid": active.id}
+
+        # one share check for the whole set
+        if api.sql_1row(conn, select_unshared, params) != len(ids):
+            raise api.UserError(
+                "user-not-authorized",
+                "Some personas are not shared (or owned) by the active user.",
+            )
+
+        results.tables["personas", True] = api.sql_tab2(conn, select, params)
+
+        bit_colrows = api.sql_tab2(conn, select_bits, params)
+
+        f = fernet_keyed(conn)
+
+        columns = api.tab2_columns_transform(bit_colrows[0], remove=DATA_KEY_NAMES)
+
+        def decrypt(oldrow, row):
+            if reveal:
+                _prime_data_key(f, oldrow)
+                _decrypt_bit_data(f, row.bit_data)
+            else:
+                _mask_bit_data(row.bit_data)
+
+        rows = api.tab2_rows_transform(bit_colrows, columns, decrypt)
+        results.tables["bits"] = columns, rows
+
+        results.tables["tags"] = api.sql_tab2(conn, select_tags, params)
+        results.tables["shares"] = api.sql_tab2(conn, select_shares, params)
+    return results.json_out()
+
+
 @app.put("/api/persona/<per_id>", name="put_api_persona")
 def put_api_persona(per_id):
     persona = api.table_from_tab2(
@@ -320,16 +841,6 @@ def put_api_persona(per_id):
                         "Corporate entities must have blank title and title.",
                     )
 
-    insert_adds = """
-insert into contacts.tagpersona (tag_id, persona_id)
-select unnest(%(adds)s)::uuid, %(per)s"""
-    # TODO:  need unique constraint
-    # on conflict (tag_id, persona_id) do nothing"""
-
-    delete_removes = """
-delete from contacts.tagpersona
-where tag_id in %(removes)s and persona_id=%(per)s"""
-
     insert_share = """
 insert into contacts.persona_shares (persona_id, user_id)
 values (%(pid)s, %(uid)s);
@@ -348,22 +859,16 @@ values (%(pid)s, %(uid)s);
         with api.writeblock(conn) as w:
             w.upsert_rows("contacts.personas", persona)
 
+        _refresh_persona_search(conn, per_id)
+
         if share_to_owner:
             api.sql_void(conn, insert_share, share_to_owner)
 
         if tagdeltas:
-            if tagdeltas.rows[0].tags_add:
-                api.sql_void(
-                    conn,
-                    insert_adds,
-                    {"adds": tagdeltas.rows[0].tags_add, "per": per_id},
-                )
-            if tagdeltas.rows[0].tags_remove:
-                api.sql_void(
-                    conn,
-                    delete_removes,
-                    {"removes": tuple(tagdeltas.rows[0].tags_remove), "per": per_id},
-                )
+            row = tagdeltas.rows[0]
+            adds = [(t, per_id) for t in row.tags_add or []]
+            removes = [(t, per_id) for t in row.tags_remove or []]
+            _apply_tag_deltas(conn, adds, removes)
 
         payload = json.dumps({"id": per_id})
         api.notify_listener(conn, "personas", payload)
@@ -372,6 +877,42 @@ values (%(pid)s, %(uid)s);
     return api.Results().json_out()
 
 
+def _update_persona_tags(conn, adds, removes):
+    """
+    Apply the (tag_id, persona_id) pairs adds and removes to personas owned
+    by the active user and notify the personas listeners.
+    """
+    _parse_uuids([a[0] for a in adds + removes], "tag_id")
+    persona_ids = _parse_uuids([a[1] for a in adds + removes], "persona_id")
+    if len(persona_ids) == 0:
+        return
+
+    _raise_unmatched_owners(conn, persona_ids)
+
+    _apply_tag_deltas(conn, adds, removes)
+
+    _notify_personas(conn, persona_ids)
+
+
+@app.put("/api/personas/tags", name="put_api_personas_tags")
+def put_api_personas_tags():
+    tagdeltas = api.table_from_tab2(
+        "tagdeltas", required=["persona_id", "tags_add", "tags_remove"]
+    )
+
+    adds = []
+    removes = []
+    for row in tagdeltas.rows:
+        adds += [(t, row.persona_id) for t in row.tags_add or []]
+        removes += [(t, row.persona_id) for t in row.tags_remove or []]
+
+    with app.dbconn() as conn:
+        _update_persona_tags(conn, adds, removes)
+        conn.commit()
+
+    return api.Results().json_out()
+
+
 @app.put("/api/persona/<per_id>/reshare", name="put_api_persona_reshare")
 def put_persona_reshare(request, per_id):
     persona = api.table_from_tab2(
@@ -392,8 +933,7 @@ def put_persona_reshare(request, per_id):
     return api.Results().json_out()
 
 
-@app.delete("/api/persona/<per_id>", name="delete_api_persona")
-def delete_api_persona(per_id):
+def _delete_persona(conn, persona_id):
     delete_sql = """
 -- delete bits
 delete from contacts.urls where persona_id=%(pid)s;
@@ -410,10 +950,15 @@ delete from contacts.persona_shares where persona_id=%(pid)s;
 delete from contacts.personas where id=%(pid)s;
 """
 
+    api.sql_void(conn, delete_sql, {"pid": persona_id})
+
+
+@app.delete("/api/persona/<per_id>", name="delete_api_persona")
+def delete_api_persona(per_id):
     with app.dbconn() as conn:
         _raise_unmatched_owner(conn, per_id)
 
-        api.sql_void(conn, delete_sql, {"pid": per_id})
+        _delete_persona(conn, per_id)
 
         payload = json.dumps({"id": per_id})
         api.notify_listener(conn, "personas", payload)
@@ -472,11 +1017,11 @@ where false"""
 
         if bittype == "urls":
             columns = [
-                c for c in columns if c[0] not in ["password_enc", "bit_sequence"]
+                c for c in columns if c[0] not in ["password_enc", *bit_server_columns]
             ]
             columns.append(("password", None))
         else:
-            columns = [c for c in columns if c[0] not in ["bit_sequence"]]
+            columns = [c for c in columns if c[0] not in bit_server_columns]
 
         def default_row(index, row):
             row.id = str(uuid.uuid1())
@@ -514,15 +1059,16 @@ where bit.id=%(bit_id)s"""
 
         select = select.replace("/*BIT*/", bittype)
         rawdata = api.sql_tab2(conn, select, {"bit_id": bit_id})
+        hidden = [c[0] for c in rawdata[0] if c[0] in bit_server_columns]
 
         if bittype == "urls":
             # use the key to decrypt the password replacing column password_enc
             # with password
-            f = fernet_keyed()
+            f = fernet_keyed(conn)
 
             columns = api.tab2_columns_transform(
                 rawdata[0],
-                remove=["password_enc", "bit_sequence"],
+                remove=["password_enc", *hidden],
                 insert=[("username", "password")],
             )
 
@@ -530,13 +1076,16 @@ where bit.id=%(bit_id)s"""
                 if oldrow.password_enc != None:
                     enc = oldrow.password_enc
                     # convert the psycopg2 memoryview to bytes
-                    row.password = f.decrypt(enc.tobytes()).decode("utf8")
+                    data = f.decrypt(
+                        enc.tobytes(), oldrow.data_key_id, oldrow.password_key_id
+                    )
+                    row.password = data.decode("utf8")
 
             rows = api.tab2_rows_transform(rawdata, columns, decrypt)
             # not so raw any more, but that's ok
             rawdata = columns, rows
         else:
-            columns = api.tab2_columns_transform(rawdata[0], remove=["bit_sequence"])
+            columns = api.tab2_columns_transform(rawdata[0], remove=hidden)
 
             def nothing(oldrow, row):
                 pass
@@ -550,6 +1099,43 @@ where bit.id=%(bit_id)s"""
     return results.json_out()
 
 
+@app.get(
+    "/api/persona/<per_id>/bit/<bit_id>/password",
+    name="get_api_persona_bit_password",
+)
+def get_api_persona_bit_password(per_id, bit_id):
+    # the share check is part of the query
+    select = """
+select urls.password_enc, urls.password_key_id, urls.data_key_id
+from contacts.urls
+join contacts.persona_shares pshare on pshare.persona_id=urls.persona_id
+    and pshare.user_id=%(uid)s
+where urls.id=%(bid)s and urls.persona_id=%(pid)s
+"""
+
+    results = api.Results()
+    with app.dbconn() as conn:
+        active = api.active_user(conn)
+        params = {"uid": active.id, "pid": per_id, "bid": bit_id}
+        row = api.sql_1object(conn, select, params)
+
+        if row is None:
+            raise api.UserError(
+                "invalid-key", "No shared password bit with that id to reveal"
+            )
+
+        if row.password_enc is None:
+            results.keys["password"] = None
+        else:
+            f = fernet_keyed(conn)
+            # convert the psycopg2 memoryview to bytes
+            enc = row.password_enc.tobytes()
+            data = f.decrypt(enc, row.data_key_id, row.password_key_id)
+            results.keys["password"] = data.decode("utf8")
+
+    return results.json_out()
+
+
 @app.put("/api/persona/<per_id>/bits/reorder", name="put_api_persona_bits_reorder")
 def put_api_persona_bits_reorder(request, per_id):
     # order this with bit_id1 ordered before bit_id2
@@ -653,20 +1239,34 @@ def put_api_persona_bit(per_id, bit_id):
         row.persona_id = per_id
         row.id = bit_id
 
+    if bittype == "urls" and "password" in bit.DataRow.__slots__:
+        for row in bit.rows:
+            if row.password and breach.is_breached(row.password):
+                raise api.UserError(
+                    "breached-password",
+                    "This password appears in a known breach; choose another.",
+                )
+
     with app.dbconn() as conn:
         _raise_unmatched_owner(conn, per_id)
 
         if bittype == "urls" and "password" in bit.DataRow.__slots__:
-            # use the key to encrypt the password
-            f = fernet_keyed()
+            # use the owner's data key to encrypt the password; the owner
+            # was checked to be the active user above
+            f = fernet_keyed(conn)
+            owner_id = api.active_user(conn).id
 
-            # replace column password with password_enc
+            # replace column password with password_enc, the id of the data
+            # key which encrypted it and the fingerprint of the password
             # null password for now (soon that column with be deleted)
             columns = []
             to_copy = []
             for c in bit.DataRow.__slots__:
                 if c == "password":
                     columns.append("password_enc")
+                    columns.append("password_key_id")
+                    columns.append("data_key_id")
+                    columns.append("password_fingerprint")
                 else:
                     columns.append(c)
                     to_copy.append(c)
@@ -677,12 +1277,39 @@ def put_api_persona_bit(per_id, bit_id):
                     for a in to_copy:
                         setattr(r2, a, getattr(row, a))
                     if row.password != None:
-                        r2.password_enc = f.encrypt(row.password.encode("utf8"))
+                        data = row.password.encode("utf8")
+                        enc, dkid = f.encrypt(owner_id, data)
+                        r2.password_enc, r2.data_key_id = enc, dkid
+                        r2.password_key_id = None
+                        r2.password_fingerprint = keys.manager.fingerprint(data)
+
+            bit = tt
+
+        if bittype == "urls" and "url" in bit.DataRow.__slots__:
+            # store the reversed host for the autofill lookup
+            tt = rtlib.simple_table([*bit.DataRow.__slots__, "url_host_rev"])
+            for row in bit.rows:
+                with tt.adding_row() as r2:
+                    for a in bit.DataRow.__slots__:
+                        setattr(r2, a, getattr(row, a))
+                    r2.url_host_rev = url_host_reversed(row.url)
+
+            bit = tt
+
+        if bittype == "phone_numbers" and "number" in bit.DataRow.__slots__:
+            # store the normalized digits beside the number as entered
+            tt = rtlib.simple_table([*bit.DataRow.__slots__, "number_digits"])
+            for row in bit.rows:
+                with tt.adding_row() as r2:
+                    for a in bit.DataRow.__slots__:
+                        setattr(r2, a, getattr(row, a))
+                    r2.number_digits = normalize_phone(row.number)
 
             bit = tt
 
         with api.writeblock(conn) as w:
             w.upsert_rows(f"contacts.{bittype}", bit)
+        _refresh_persona_search(conn, per_id)
         conn.commit()
 
     return api.Results().json_out()
@@ -693,12 +1320,15 @@ def put_api_persona_contact_bit_rotate(per_id, bit_id):
     # bit_type must be url
 
     select = """
-select id, persona_id, password_enc
+select urls.id, urls.persona_id, urls.password_enc, urls.password_key_id,
+    urls.data_key_id, personas.owner_id
 from contacts.urls
-where id=%(bitid)s and persona_id=%(perid)s
+join contacts.personas on personas.id=urls.persona_id
+where urls.id=%(bitid)s and urls.persona_id=%(perid)s
 """
     update = """
-update contacts.urls set password_enc=%(newpass)s
+update contacts.urls set password_enc=%(newpass)s, password_key_id=null,
+    data_key_id=%(newkey)s
 where id=%(bitid)s and persona_id=%(perid)s
 """
 
@@ -708,13 +1338,19 @@ where id=%(bitid)s and persona_id=%(perid)s
         if row is None:
             raise api.UserError("invalid-key", "No password bit for that id to rotate")
 
-        # use the key to encrypt the password
-        f = fernet_keyed()
+        # move a password encrypted directly with a master key under its
+        # owner's data key; master key rotation rewraps the data keys
+        f = fernet_keyed(conn)
 
-        newpass = f.rotate(row.password_enc.tobytes())
-        api.sql_void(
-            conn, update, {"bitid": bit_id, "perid": per_id, "newpass": newpass}
+        newpass, newkey = f.rotate(
+            row.password_enc.tobytes(),
+            row.owner_id,
+            row.data_key_id,
+            row.password_key_id,
         )
+        params = {"bitid": bit_id, "perid": per_id}
+        params.update({"newpass": newpass, "newkey": newkey})
+        api.sql_void(conn, update, params)
         conn.commit()
 
     return api.Results().json_out()
@@ -733,11 +1369,160 @@ delete from contacts.email_addresses where persona_id=%(pid)s and id=%(bid)s;
         _raise_unmatched_owner(conn, per_id)
 
         api.sql_void(conn, delete_sql, {"pid": per_id, "bid": bit_id})
+        _refresh_persona_search(conn, per_id)
         conn.commit()
 
     return api.Results().json_out()
 
 
+def _phone_lookup(conn, user_id, number):
+    """
+    Return the (columns, rows) of the phone numbers shared with user_id
+    ending in the national digits of the normalized number.
+    """
+    # Match on the trailing (national) digits so that numbers stored with or
+    # without a country code are found.  The reversed digits make this a
+    # prefix search on the number_digits index.
+    select = """
+select phone_numbers.persona_id,
+    personas.entity_name,
+    phone_numbers.id,
+    phone_numbers.name,
+    phone_numbers.number,
+    phone_numbers.is_primary
+from contacts.phone_numbers
+join contacts.personas_calc personas on personas.id=phone_numbers.persona_id
+join contacts.persona_shares pshare on pshare.persona_id=personas.id
+where pshare.user_id=%(uid)s
+    and reverse(phone_numbers.number_digits) like %(reversed)s
+order by phone_numbers.is_primary desc, personas.entity_name
+"""
+
+    params = {"uid": user_id, "reversed": number[-10:][::-1] + "%"}
+
+    cm = api.ColumnMap(
+        persona_id=api.cgen.lms_personas_persona.surrogate(),
+        entity_name=api.cgen.lms_personas_persona.name(
+            url_key="persona_id", represents=True
+        ),
+        id=api.cgen.auto(hidden=True),
+    )
+    return api.sql_tab2(conn, select, params, cm)
+
+
+@app.get("/api/phone/lookup", name="get_api_phone_lookup")
+def get_api_phone_lookup(request):
+    number = normalize_phone(request.query.get("number", None))
+
+    if number is None or len(number) < 7:
+        raise api.UserError("invalid-param", "Give a phone number of 7 or more digits.")
+
+    results = api.Results()
+    with app.dbconn() as conn:
+        active = api.active_user(conn)
+        results.tables["phone_numbers", True] = _phone_lookup(conn, active.id, number)
+    return results.json_out()
+
+
+def _email_lookup(conn, user_id, emails):
+    """
+    Return the (columns, rows) of the email addresses shared with user_id
+    matching (case insensitively) the list of emails.
+    """
+    # served by the index on lower(email)
+    select = """
+select lower(email_addresses.email) as email,
+    email_addresses.persona_id,
+    personas.entity_name,
+    email_addresses.id
+from contacts.email_addresses
+join contacts.personas_calc personas on personas.id=email_addresses.persona_id
+join contacts.persona_shares pshare on pshare.persona_id=personas.id
+where pshare.user_id=%(uid)s
+    and lower(email_addresses.email)=any(%(emails)s)
+order by lower(email_addresses.email), personas.entity_name
+"""
+
+    params = {"uid": user_id, "emails": list({e.strip().lower() for e in emails})}
+
+    cm = api.ColumnMap(
+        persona_id=api.cgen.lms_personas_persona.surrogate(),
+        entity_name=api.cgen.lms_personas_persona.name(
+            url_key="persona_id", represents=True
+        ),
+        id=api.cgen.auto(hidden=True),
+    )
+    return api.sql_tab2(conn, select, params, cm)
+
+
+@app.get("/api/email/lookup", name="get_api_email_lookup")
+def get_api_email_lookup(request):
+    emails = request.query.get("emails", None)
+
+    if emails in ["", None]:
+        raise api.UserError("invalid-param", "Give one or more ;-separated emails.")
+
+    results = api.Results()
+    with app.dbconn() as conn:
+        active = api.active_user(conn)
+        results.tables["email_addresses", True] = _email_lookup(
+            conn, active.id, emails.split(";")
+        )
+    return results.json_out()
+
+
+def _urls_lookup(conn, user_id, host_rev):
+    """
+    Return the (columns, rows) of the url bits shared with user_id for the
+    reversed host name host_rev or one of its parent domains, the closest
+    first.
+    """
+    # The page host and each parent domain (but not a bare top level domain)
+    # are looked up as exact matches on the url_host_rev index.
+    labels = host_rev.split(".")
+    hosts = [".".join(labels[:i]) for i in range(len(labels), 1, -1)] or labels
+
+    select = """
+select urls.persona_id,
+    personas.entity_name,
+    urls.id,
+    urls.name,
+    urls.url,
+    urls.username
+from contacts.urls
+join contacts.personas_calc personas on personas.id=urls.persona_id
+join contacts.persona_shares pshare on pshare.persona_id=personas.id
+where pshare.user_id=%(uid)s
+    and urls.url_host_rev=any(%(hosts)s)
+order by length(urls.url_host_rev) desc, urls.is_primary desc, personas.entity_name
+"""
+
+    params = {"uid": user_id, "hosts": hosts}
+
+    cm = api.ColumnMap(
+        persona_id=api.cgen.lms_personas_persona.surrogate(),
+        entity_name=api.cgen.lms_personas_persona.name(
+            url_key="persona_id", represents=True
+        ),
+        id=api.cgen.auto(hidden=True),
+    )
+    return api.sql_tab2(conn, select, params, cm)
+
+
+@app.get("/api/urls/lookup", name="get_api_urls_lookup")
+def get_api_urls_lookup(request):
+    host_rev = url_host_reversed(request.query.get("url", None))
+
+    if host_rev is None:
+        raise api.UserError("invalid-param", "Give a url with a host name.")
+
+    results = api.Results()
+    with app.dbconn() as conn:
+        active = api.active_user(conn)
+        results.tables["urls", True] = _urls_lookup(conn, active.id, host_rev)
+    return results.json_out()
+
+
 @app.get("/api/personas/all-bits", name="get_api_personas_all_bits")
 def get_api_personas_all_bits(request):
     bittype = request.query.get("bit_type", None)
@@ -0,0 +1,413 @@
+import os
+import signal
+import logging
+import hmac
+import hashlib
+import threading
+import selectors
+import cryptography.fernet
+import yenot.backend.api as api
+
+app = api.get_global_app()
+
+logger = logging.getLogger(__name__)
+
+
+def key_id(key):
+    """
+    Return the short, stable identifier recorded beside ciphertexts encrypted
+    with the Fernet key `key` (a url-safe base64 string).
+    """
+    return hashlib.sha256(key.encode("ascii")).hexdigest()[:16]
+
+
+class KeySet:
+    def __init__(self, keys, fingerprint_key=None):
+        # keys is a list of key strings with the current key first
+        self.fingerprint_key = fingerprint_key
+        self.current_id = key_id(keys[0])
+        self.by_id = {
+            key_id(k): cryptography.fernet.Fernet(k.encode("ascii")) for k in keys
+        }
+        self.multi = cryptography.fernet.MultiFernet(
+            [self.by_id[key_id(k)] for k in keys]
+        )
+
+
+class KeyManager:
+    """
+    Process wide MultiFernet for the contacts password keys.
+
+    The keys are LMS_CONTACTS_KEY (the current key) and the optional
+    LMS_CONTACTS_KEY_ROTATE1..3 (older keys still accepted for decryption).
+    They are read from the environment or, when LMS_CONTACTS_KEY_FILE names
+    a file of NAME=value lines, from that file.  The keys are loaded on first
+    use and reloaded only by reload(); see KEYS_CHANNEL.  The optional
+    LMS_CONTACTS_KEY_FINGERPRINT is the HMAC key of password fingerprints.
+
+    Ciphertexts are stored with the key_id of the key which encrypted them
+    so that decryption can go directly to that key rather than trying each
+    key of the MultiFernet in turn.
+    """
+
+    basekey = "LMS_CONTACTS_KEY"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counter_lock = threading.Lock()
+        self._keyset = None
+        self.counters = {
+            "key_builds": 0,
+            "encrypts": 0,
+            "decrypts": 0,
+            "trial_decrypts": 0,
+            "rotates": 0,
+        }
+
+    def _count(self, name):
+        with self.counter_lock:
+            self.counters[name] += 1
+
+    def _key_values(self):
+        values = dict(os.environ)
+        keyfile = os.environ.get(f"{self.basekey}_FILE", None)
+        if keyfile:
+            with open(keyfile) as ff:
+                for line in ff:
+                    line = line.strip()
+                    if line == "" or line.startswith("#"):
+                        continue
+                    name, value = line.split("=", 1)
+                    values[name.strip()] = value.strip()
+        return values
+
+    def _build(self):
+        values = self._key_values()
+
+        names = [self.basekey, *[f"{self.basekey}_ROTATE{i+1}" for i in range(3)]]
+        fpkey = values.get(f"{self.basekey}_FINGERPRINT", None)
+        keyset = KeySet(
+            [values[n] for n in names if n in values],
+            fpkey.encode("utf8") if fpkey else None,
+        )
+        self._count("key_builds")
+        return keyset
+
+    def keyset(self):
+        _ensure_reload_watcher()
+        keyset = self._keyset
+        if keyset is None:
+            with self.lock:
+                if self._keyset is None:
+                    self._keyset = self._build()
+                keyset = self._keyset
+        return keyset
+
+    def multifernet(self):
+        return self.keyset().multi
+
+    def current_key_id(self):
+        return self.keyset().current_id
+
+    def reload(self):
+        # build before swapping so that a bad key leaves the old keys in place
+        keyset = self._build()
+        with self.lock:
+            self._keyset = keyset
+
+    def encrypt(self, data):
+        """
+        Encrypt with the current key returning the token and its key_id.
+        """
+        keyset = self.keyset()
+        self._count("encrypts")
+        return keyset.by_id[keyset.current_id].encrypt(data), keyset.current_id
+
+    def decrypt(self, token, key_id=None):
+        """
+        Decrypt with the key named by key_id or, for ciphertexts of unknown
+        key, by trying each key.
+        """
+        keyset = self.keyset()
+        self._count("decrypts")
+        fernet = keyset.by_id.get(key_id, None)
+        if fernet is None:
+            self._count("trial_decrypts")
+            return keyset.multi.decrypt(token)
+        return fernet.decrypt(token)
+
+    def rotate(self, token, key_id=None):
+        """
+        Re-encrypt token with the current key returning the new token and its
+        key_id.
+        """
+        keyset = self.keyset()
+        self._count("rotates")
+        fernet = keyset.by_id.get(key_id, None)
+        if fernet is None:
+            self._count("trial_decrypts")
+            data = keyset.multi.decrypt(token)
+        else:
+            data = fernet.decrypt(token)
+        return keyset.by_id[keyset.current_id].encrypt(data), keyset.current_id
+
+    def fingerprints_enabled(self):
+        return self.keyset().fingerprint_key is not None
+
+    def fingerprint(self, data):
+        """
+        Return the keyed HMAC-SHA256 of data which is stored beside a password
+        to find reuse without decrypting, or None if no fingerprint key is
+        configured.
+        """
+        keyset = self.keyset()
+        if keyset.fingerprint_key is None:
+            return None
+        return hmac.new(keyset.fingerprint_key, data, hashlib.sha256).digest()
+
+    def metrics(self):
+        with self.counter_lock:
+            return dict(self.counters)
+
+
+manager = KeyManager()
+
+
+class DataKeys:
+    """
+    Envelope encryption with a data key per owner.  Each owner's Fernet data
+    key is stored in contacts.data_keys wrapped (encrypted) by the master
+    keys of the KeyManager, so rotating a master key only rewraps the data
+    keys.  Construct one per request; unwrapped data keys are cached for the
+    life of the object.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.fernets = {}
+        self.owners = {}
+
+    def _unwrap(self, row):
+        self.prime(row.id, row.owner_id, row.wrapped_key, row.master_key_id)
+
+    def prime(self, data_key_id, owner_id, wrapped_key, master_key_id):
+        """
+        Cache a data key read from contacts.data_keys by the caller's own
+        query.
+        """
+        # keyed by the str of the id whether it comes from a uuid column or
+        # from the bit_data json
+        data_key_id = str(data_key_id)
+        if data_key_id not in self.fernets:
+            dek = manager.decrypt(bytes(wrapped_key), master_key_id)
+            self.fernets[data_key_id] = cryptography.fernet.Fernet(dek)
+            self.owners[owner_id] = data_key_id
+
+    def fernet(self, data_key_id):
+        select = """
+select id, owner_id, wrapped_key, master_key_id
+from contacts.data_keys
+where id=%(dkid)s"""
+
+        data_key_id = str(data_key_id)
+        if data_key_id not in self.fernets:
+            row = api.sql_1object(self.conn, select, {"dkid": data_key_id})
+            if row is None:
+                raise api.UserError(
+                    "invalid-key", "The data key of this password is missing."
+                )
+            self._unwrap(row)
+        return self.fernets[data_key_id]
+
+    def for_owner(self, owner_id):
+        """
+        Return the data key id of owner_id, creating the data key on first
+        use.
+        """
+        insert = """
+insert into contacts.data_keys (owner_id, wrapped_key, master_key_id)
+values (%(oid)s, %(wrapped)s, %(mkid)s)
+on conflict (owner_id) do nothing"""
+
+        select = """
+select id, owner_id, wrapped_key, master_key_id
+from contacts.data_keys
+where owner_id=%(oid)s"""
+
+        if owner_id not in self.owners:
+            row = api.sql_1object(self.conn, select, {"oid": owner_id})
+            if row is None:
+                dek = cryptography.fernet.Fernet.generate_key()
+                wrapped, mkid = manager.encrypt(dek)
+                params = {"oid": owner_id, "wrapped": wrapped, "mkid": mkid}
+                api.sql_void(self.conn, insert, params)
+                row = api.sql_1object(self.conn, select, {"oid": owner_id})
+            self._unwrap(row)
+        return self.owners[owner_id]
+
+    def encrypt(self, owner_id, data):
+        """
+        Encrypt with the data key of owner_id returning the token and the
+        data key id.
+        """
+        data_key_id = self.for_owner(owner_id)
+        return self.fernet(data_key_id).encrypt(data), data_key_id
+
+    def decrypt(self, token, data_key_id=None, key_id=None):
+        """
+        Decrypt with the data key data_key_id or, for ciphertexts which
+        predate envelope encryption, with the master key key_id.
+        """
+        if data_key_id is None:
+            return manager.decrypt(token, key_id)
+        return self.fernet(data_key_id).decrypt(token)
+
+    def rotate(self, token, owner_id, data_key_id=None, key_id=None):
+        """
+        Bring a ciphertext under the owner's data key returning the token and
+        data key id.  Ciphertexts already under a data key are returned as
+        they are since master key rotation rewraps the data keys instead.
+        """
+        if data_key_id is not None:
+            return token, data_key_id
+        return self.encrypt(owner_id, manager.decrypt(token, key_id))
+
+
+# Each server process holds its own keys.  put_api_password_keys_reload
+# notifies KEYS_CHANNEL and a watcher thread per process reloads its keys on
+# any notification, or within a second of a SIGHUP when the host installed
+# install_reload_signal.
+KEYS_CHANNEL = "contacts_keys"
+
+_reload_lock = threading.Lock()
+_reload_requested = False
+_reload_thread = None
+
+
+def _reload_on_signal(signum, frame):
+    # Only set a flag; the signal interrupts arbitrary code of the main
+    # thread which may hold the manager locks.
+    global _reload_requested
+    _reload_requested = True
+
+
+def _reload_keys():
+    try:
+        manager.reload()
+    except Exception:
+        # the old keys stay in place
+        logger.exception("reloading the contacts keys failed")
+
+
+def _reload_watcher():
+    global _reload_requested, _reload_thread
+
+    try:
+        with app.dbconn() as conn:
+            api.sql_void(conn, f"listen {KEYS_CHANNEL}")
+            conn.commit()
+            # a reload notified before the listen took effect is not known
+            _reload_requested = True
+
+            with selectors.DefaultSelector() as sel:
+                sel.register(conn, selectors.EVENT_READ)
+                while True:
+                    sel.select(timeout=1)
+                    conn.poll()
+                    if len(conn.notifies) > 0 or _reload_requested:
+                        conn.notifies.clear()
+                        _reload_requested = False
+                        _reload_keys()
+    finally:
+        with _reload_lock:
+            _reload_thread = None
+
+
+def _ensure_reload_watcher():
+    global _reload_thread
+
+    if _reload_thread is not None:
+        return
+    with _reload_lock:
+        if _reload_thread is None:
+            _reload_thread = threading.Thread(target=_reload_watcher, daemon=True)
+            _reload_thread.start()
+
+
+def install_reload_signal():
+    """
+    Also reload the keys of this process on SIGHUP.  yenot does not call
+    this and importing this module does not touch the process signal
+    handlers; a host which wants SIGHUP reloads calls it from its main
+    thread at start up.
+    """
+    _ensure_reload_watcher()
+    signal.signal(signal.SIGHUP, _reload_on_signal)
+
+
+@app.put("/api/password/keys/reload", name="put_api_password_keys_reload")
+def put_api_password_keys_reload():
+    # reload here first so that a bad key is reported to the caller; the
+    # notification reloads every other server process
+    manager.reload()
+
+    with app.dbconn() as conn:
+        api.notify_listener(conn, KEYS_CHANNEL, "reload")
+        conn.commit()
+
+    results = api.Results()
+    results.keys["metrics"] = manager.metrics()
+    return results.json_out()
+
+
+@app.get("/api/password/keys/metrics", name="get_api_password_keys_metrics")
+def get_api_password_keys_metrics():
+    results = api.Results()
+    results.keys["metrics"] = manager.metrics()
+    return results.json_out()
+
+
+@app.get(
+    "/api/password/keys/versions",
+    name="get_api_password_keys_versions",
+    report_title="Password Key Versions",
+)
+def get_api_password_keys_versions():
+    select = """
+-- passwords encrypted directly with a master key and data keys wrapped by one
+select 'passwords' as wrapping, urls.password_key_id as key_id,
+    count(*) as ciphertexts
+from contacts.urls
+where urls.password_enc is not null and urls.data_key_id is null
+group by urls.password_key_id
+union all
+select 'data keys' as wrapping, data_keys.master_key_id as key_id,
+    count(*) as ciphertexts
+from contacts.data_keys
+group by data_keys.master_key_id
+order by wrapping desc, ciphertexts desc
+"""
+
+    keyset = manager.keyset()
+
+    results = api.Results(default_title=True)
+    with app.dbconn() as conn:
+        rawdata = api.sql_tab2(conn, select)
+
+        columns = api.tab2_columns_transform(
+            rawdata[0], insert=[("ciphertexts", "status")]
+        )
+
+        def key_status(oldrow, row):
+            if oldrow.key_id is None:
+                row.status = "unversioned"
+            elif oldrow.key_id == keyset.current_id:
+                row.status = "current"
+            elif oldrow.key_id in keyset.by_id:
+                row.status = "rotated"
+            else:
+                row.status = "not loaded"
+
+        rows = api.tab2_rows_transform(rawdata, columns, key_status)
+        results.tables["keys", True] = columns, rows
+    return results.json_out()
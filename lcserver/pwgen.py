@@ -0,0 +1,103 @@
+import random
+from . import word_list
+
+# The password generators are pure python so that bench_passwords.py can
+# run them without yenot; the endpoint is in passwords.py.
+
+alpha = "abcdefghijklmnopqrstuvwxyz"
+vowels = "aeiou"
+consonants = "".join([c for c in alpha if c not in vowels])
+vowels += "y"
+numbers = "0123456789"
+symbols = "`~!@#$%^&*()[]{}:;/.,<>?"
+
+digraphs = ["th", "sh", "ch", "st", "kn", "wh"]
+
+
+# Each generator takes the random.Random instance rng to draw from; the
+# endpoint gives each request its own SystemRandom (which draws from
+# os.urandom) rather than reseeding the module global generator.
+
+
+def triplet(rng):
+    """
+    Generate a short 'pronounciable' bit.
+    """
+    ends = digraphs + list(consonants)
+    spaces = [ends, list(vowels), ends]
+    bit = "".join([rng.sample(x, 1)[0] for x in spaces])
+    if rng.randint(0, 1) == 1:
+        bit = bit.title()
+    return bit
+
+
+def pronounciable(bits, tipSpace=None, rng=random):
+    """
+    :param minlen:  minimum password length
+    :param maxlen:  maximum password length
+
+    >>> 0 <= len(pronounciable(0, 3)) <= 3
+    True
+    >>> 3 <= len(pronounciable(3, 50)) <= 50
+    True
+    >>> 8 <= len(pronounciable(8, 10)) <= 10
+    True
+    >>> 8 <= len(pronounciable(8, 10, tipSpace="all")) <= 10
+    True
+    """
+
+    # each triplet has 5+2+5+1 bits
+    tripbits = 13
+
+    triplet_count = (bits - 1) // tripbits + 1
+    minlen = triplet_count * 4 - 3
+    maxlen = triplet_count * 4 + 3
+
+    trips = [triplet(rng) for i in range(triplet_count)]
+    while len("".join(trips)) > (minlen + maxlen) // 2:
+        trips = trips[:-1]
+
+    if tipSpace is None or tipSpace == "numeric":
+        tipSpace = numbers
+    elif tipSpace == "all":
+        tipSpace = numbers + numbers + symbols
+
+    trip_count = len("".join(trips))
+    assert trip_count < maxlen
+    tipCount = rng.randint(max(0, minlen - trip_count), maxlen - trip_count)
+    tips = [rng.sample(tipSpace, 1)[0] for i in range(tipCount)]
+
+    total = trips + tips
+    rng.shuffle(total)
+    return "".join(total)
+
+
+def _random(bits, charset, rng):
+    middle_bits = bits - 11
+
+    per_word = len(charset).bit_length() - 1
+    char_count = (middle_bits - 1) // per_word + 1
+
+    chosen = rng.sample(charset, char_count)
+    ends = rng.sample(alpha + alpha.upper(), 2)
+    return ends[0] + "".join(chosen) + ends[1]
+
+
+def random_pword(bits, rng=random):
+    charset = alpha + alpha.upper() + numbers + symbols
+    return _random(bits, charset, rng)
+
+
+def alphanumeric(bits, rng=random):
+    charset = alpha + alpha.upper() + numbers
+    return _random(bits, charset, rng)
+
+
+def words(bits, rng=random):
+    xwords = word_list.words()
+
+    per_word = len(xwords).bit_length() - 1
+    word_count = (bits - 1) // per_word + 1
+
+    chosen = rng.sample(range(len(xwords)), word_count)
+    return " ".join(xwords[i] for i in chosen)
@@ -1,23 +1,23 @@
 import yenot.backend.api as api
+from . import contacts
+from . import keys
 
 app = api.get_global_app()
 
 
 def get_api_personas_address_list_prompts():
     return api.PromptList(
-        tag_id=api.cgen.contact_tag.id(label="Tag"), __order__=["tag_id"]
+        tag_id=api.cgen.contact_tag.id(label="Tag"),
+        include_descendants=api.cgen.boolean(label="Include Sub-tags"),
+        __order__=["tag_id", "include_descendants"],
     )
 
 
-@app.get(
-    "/api/personas/address-list",
-    name="get_api_personas_address_list",
-    report_prompts=get_api_personas_address_list_prompts,
-    report_title="Street Address List",
-)
-def get_api_personas_list(request):
-    tag = request.query.get("tag_id", None)
-
+def _address_list(conn, tag, descendants=False):
+    """
+    Return the (columns, rows) of the street addresses of the personas
+    tagged tag (or, with descendants, one of its sub-tags).
+    """
     select = """
 select personas.id, 
     personas.f_name||' '||personas.l_name as name,
@@ -30,21 +30,173 @@ select personas.id,
             chr(10)) as street_address
 from contacts.personas
 left outer join contacts.street_addresses sa on sa.persona_id=personas.id
-join contacts.tagpersona on tagpersona.persona_id=personas.id
-where tagpersona.tag_id=%(tag)s
+where /*TAG*/
 order by personas.l_name, personas.f_name
 """
 
+    tagfilter = contacts.TAG_DESCENDANTS_FILTER if descendants else contacts.TAG_FILTER
+    select = select.replace("/*TAG*/", tagfilter)
+
     params = {"tag": tag}
 
+    cm = api.ColumnMap(
+        id=api.cgen.lms_personas_persona.surrogate(),
+        name=api.cgen.lms_personas_persona.name(url_key="id", represents=True),
+        l_name=api.cgen.lms_personas_persona.name(hidden=True),
+        f_name=api.cgen.lms_personas_persona.name(hidden=True),
+        street_address=api.cgen.multiline(),
+    )
+    return api.sql_tab2(conn, select, params, cm)
+
+
+@app.get(
+    "/api/personas/address-list",
+    name="get_api_personas_address_list",
+    report_prompts=get_api_personas_address_list_prompts,
+    report_title="Street Address List",
+)
+def get_api_personas_list(request):
+    tag = request.query.get("tag_id", None)
+    descendants = request.query.get("include_descendants", "false") in ("true", "1")
+
+    results = api.Results(default_title=True)
+    with app.dbconn() as conn:
+        results.tables["personas", True] = _address_list(conn, tag, descendants)
+    return results.json_out()
+
+
+# longest look-ahead of get_api_passwords_due
+DUE_MAX_DAYS = 3650
+
+
+def get_api_passwords_due_prompts():
+    return api.PromptList(
+        days=api.cgen.integer(label="Due Within (days)"),
+        __order__=["days"],
+    )
+
+
+def _passwords_due(conn, user_id, days):
+    """
+    Return the (columns, rows) of the url bits shared with user_id with a
+    password reset due within days.
+    """
+    # the range condition on pw_next_reset_dt is served by its index
+    select = """
+select urls.persona_id,
+    personas.entity_name,
+    urls.id,
+    urls.name,
+    urls.url,
+    urls.username,
+    urls.pw_reset_dt,
+    current_date-urls.pw_reset_dt as age_days,
+    urls.pw_next_reset_dt,
+    urls.pw_next_reset_dt-current_date as due_days
+from contacts.urls
+join contacts.persona_shares pshare on pshare.persona_id=urls.persona_id
+join contacts.personas_calc personas on personas.id=urls.persona_id
+where pshare.user_id=%(uid)s
+    and urls.pw_next_reset_dt<=current_date+%(days)s
+order by urls.pw_next_reset_dt, personas.entity_name
+"""
+
+    params = {"uid": user_id, "days": days}
+
+    cm = api.ColumnMap(
+        persona_id=api.cgen.lms_personas_persona.surrogate(),
+        entity_name=api.cgen.lms_personas_persona.name(
+            url_key="persona_id", represents=True
+        ),
+        id=api.cgen.auto(hidden=True),
+        age_days=api.cgen.auto(label="Age (days)"),
+        due_days=api.cgen.auto(label="Due In (days)"),
+    )
+    return api.sql_tab2(conn, select, params, cm)
+
+
+@app.get(
+    "/api/passwords/due",
+    name="get_api_passwords_due",
+    report_prompts=get_api_passwords_due_prompts,
+    report_title="Passwords Due for Reset",
+)
+def get_api_passwords_due(request):
+    days = contacts._count_param(
+        request.query.get("days", 30), "days", DUE_MAX_DAYS, minimum=0
+    )
+
     results = api.Results(default_title=True)
     with app.dbconn() as conn:
-        cm = api.ColumnMap(
-            id=api.cgen.lms_personas_persona.surrogate(),
-            name=api.cgen.lms_personas_persona.name(url_key="id", represents=True),
-            l_name=api.cgen.lms_personas_persona.name(hidden=True),
-            f_name=api.cgen.lms_personas_persona.name(hidden=True),
-            street_address=api.cgen.multiline(),
+        active = api.active_user(conn)
+        results.tables["urls", True] = _passwords_due(conn, active.id, days)
+    return results.json_out()
+
+
+def _passwords_reused(conn, user_id):
+    """
+    Return the (columns, rows) of the url bits shared with user_id grouped
+    by reused password.
+    """
+    # Group the url bits visible to the user by password fingerprint; this is
+    # served by the fingerprint index and decrypts nothing.  Passwords without
+    # a fingerprint (see the rotation job) are not reported.
+    select = """
+with visible as (
+    select urls.id, urls.persona_id, urls.name, urls.url, urls.password_fingerprint
+    from contacts.urls
+    join contacts.persona_shares pshare on pshare.persona_id=urls.persona_id
+    where pshare.user_id=%(uid)s and urls.password_fingerprint is not null
+), reused as (
+    select password_fingerprint, count(*) as reuse_count
+    from visible
+    group by password_fingerprint
+    having count(*)>1
+)
+select dense_rank() over (
+        order by reused.reuse_count desc, reused.password_fingerprint) as reuse_group,
+    reused.reuse_count,
+    visible.persona_id,
+    personas.entity_name,
+    visible.id,
+    visible.name,
+    visible.url
+from visible
+join reused on reused.password_fingerprint=visible.password_fingerprint
+join contacts.personas_calc personas on personas.id=visible.persona_id
+order by reuse_group, personas.entity_name, visible.name
+"""
+
+    params = {"uid": user_id}
+
+    cm = api.ColumnMap(
+        reuse_group=api.cgen.auto(label="Group"),
+        reuse_count=api.cgen.auto(label="Uses"),
+        persona_id=api.cgen.lms_personas_persona.surrogate(),
+        entity_name=api.cgen.lms_personas_persona.name(
+            url_key="persona_id", represents=True
+        ),
+        id=api.cgen.auto(hidden=True),
+    )
+    return api.sql_tab2(conn, select, params, cm)
+
+
+@app.get(
+    "/api/passwords/reused",
+    name="get_api_passwords_reused",
+    report_title="Reused Passwords",
+)
+def get_api_passwords_reused():
+    # without a fingerprint key no fingerprints are stored and an empty
+    # report would read as no reuse
+    if not keys.manager.fingerprints_enabled():
+        raise api.UserError(
+            "fingerprints-disabled",
+            "Password fingerprints are not configured; set LMS_CONTACTS_KEY_FINGERPRINT.",
         )
-        results.tables["personas", True] = api.sql_tab2(conn, select, params, cm)
+
+    results = api.Results(default_title=True)
+    with app.dbconn() as conn:
+        active = api.active_user(conn)
+        results.tables["urls", True] = _passwords_reused(conn, active.id)
     return results.json_out()
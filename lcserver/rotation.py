@@ -0,0 +1,318 @@
+import threading
+import concurrent.futures as futures
+import cryptography.fernet
+import yenot.backend.api as api
+from . import keys
+from . import contacts
+
+app = api.get_global_app()
+
+# pg advisory lock key held by the one process running a rotation
+ROTATION_LOCK = 0x6C6D7372
+
+_thread_lock = threading.Lock()
+_thread = None
+
+# bounds of the batch_size and workers of put_api_password_rotation
+MAX_BATCH_SIZE = 10000
+MAX_WORKERS = 32
+
+
+def _rewrap_data_keys(conn, job):
+    """
+    Rewrap the owners' data keys with the current master key.  There is one
+    data key per owner so this is done in a single transaction.
+    """
+    select = """
+select id, wrapped_key, master_key_id
+from contacts.data_keys
+where master_key_id<>%(target)s
+for update"""
+
+    update = """
+update contacts.data_keys set wrapped_key=%(wrapped)s, master_key_id=%(mkid)s
+where id=%(dkid)s"""
+
+    checkpoint = """
+update contacts.password_rotations set
+    rotated=rotated+%(rotated)s, errors=errors+%(errors)s,
+    remaining=greatest(remaining-%(rotated)s-%(errors)s, 0),
+    active_seconds=active_seconds+extract(epoch from clock_timestamp()-updated),
+    updated=clock_timestamp()
+where id=%(job)s"""
+
+    rows = api.sql_rows(conn, select, {"target": job.target_key_id})
+
+    rotated = 0
+    for row in rows:
+        try:
+            wrapped, mkid = keys.manager.rotate(
+                row.wrapped_key.tobytes(), row.master_key_id
+            )
+        except cryptography.fernet.InvalidToken:
+            continue
+        params = {"dkid": row.id, "wrapped": wrapped, "mkid": mkid}
+        api.sql_void(conn, update, params)
+        rotated += 1
+
+    cparams = {"job": job.id, "rotated": rotated, "errors": len(rows) - rotated}
+    api.sql_void(conn, checkpoint, cparams)
+    conn.commit()
+
+
+def _rotate_one(dkeys, row):
+    # returns the (possibly unchanged) ciphertext, its data key and the
+    # password fingerprint
+    token = row.password_enc.tobytes()
+    try:
+        data = dkeys.decrypt(token, row.data_key_id, row.password_key_id)
+    except cryptography.fernet.InvalidToken:
+        return None
+    dkid = row.data_key_id
+    if dkid is None:
+        token, dkid = dkeys.encrypt(row.owner_id, data)
+    return token, dkid, keys.manager.fingerprint(data)
+
+
+def _rotate_batch(conn, pool, job, batch_size):
+    """
+    Move the next batch of passwords after the job's checkpoint (last_url_id)
+    from the master keys to their owners' data keys, fill in missing
+    fingerprints and advance the checkpoint in the same transaction.
+    Returns False when the walk is complete.
+    """
+    select = """
+select urls.id, urls.password_enc, urls.password_key_id, urls.data_key_id,
+    personas.owner_id,
+    /*DATAKEY*/
+from contacts.urls
+join contacts.personas on personas.id=urls.persona_id
+left outer join contacts.data_keys on data_keys.id=urls.data_key_id
+where urls.password_enc is not null
+    and (urls.data_key_id is null
+        or (%(fingerprints)s and urls.password_fingerprint is null))
+    and (%(last)s::uuid is null or urls.id>%(last)s::uuid)
+order by urls.id
+limit %(batch)s
+for update of urls"""
+
+    update = """
+update contacts.urls set password_enc=rotated.password_enc,
+    password_key_id=null, data_key_id=rotated.data_key_id,
+    password_fingerprint=rotated.password_fingerprint
+from (
+    select unnest(%(ids)s::uuid[]) as id,
+        unnest(%(encs)s::bytea[]) as password_enc,
+        unnest(%(dkids)s::uuid[]) as data_key_id,
+        unnest(%(fps)s::bytea[]) as password_fingerprint) rotated
+where urls.id=rotated.id"""
+
+    checkpoint = """
+update contacts.password_rotations set
+    last_url_id=%(last)s, rotated=rotated+%(rotated)s, errors=errors+%(errors)s,
+    remaining=greatest(remaining-%(rotated)s-%(errors)s, 0),
+    active_seconds=active_seconds+extract(epoch from clock_timestamp()-updated),
+    updated=clock_timestamp()
+where id=%(job)s"""
+
+    select = select.replace("/*DATAKEY*/", contacts.DATA_KEY_COLUMNS)
+
+    params = {"last": job.last_url_id, "batch": batch_size}
+    params["fingerprints"] = keys.manager.fingerprints_enabled()
+    rows = api.sql_rows(conn, select, params)
+    if len(rows) == 0:
+        return False
+
+    # Unwrap (or create) each owner's data key and the data key already
+    # encrypting each row (which need not be its owner's) on this thread;
+    # the workers then only read the cache of dkeys.
+    dkeys = keys.DataKeys(conn)
+    for row in rows:
+        contacts._prime_data_key(dkeys, row)
+    for owner_id in {row.owner_id for row in rows}:
+        dkeys.for_owner(owner_id)
+
+    rotated = list(pool.map(lambda row: _rotate_one(dkeys, row), rows))
+
+    done = [(row, r) for row, r in zip(rows, rotated) if r is not None]
+    uparams = {
+        "ids": [row.id for row, _ in done],
+        "encs": [r[0] for _, r in done],
+        "dkids": [r[1] for _, r in done],
+        "fps": [r[2] for _, r in done],
+    }
+    if len(done) > 0:
+        api.sql_void(conn, update, uparams)
+
+    cparams = {
+        "job": job.id,
+        "last": rows[-1].id,
+        "rotated": len(done),
+        "errors": len(rows) - len(done),
+    }
+    api.sql_void(conn, checkpoint, cparams)
+    conn.commit()
+
+    job.last_url_id = rows[-1].id
+    return True
+
+
+def _run_rotation(job_id, batch_size, workers, started):
+    """
+    Run the rotation job in this process if no other process is running
+    one.  started is a dict with a threading.Event "ready" which is set when
+    "locked" records whether this process took the rotation lock.
+    """
+    global _thread
+
+    select = """
+select id, target_key_id, last_url_id
+from contacts.password_rotations
+where id=%(job)s"""
+
+    # Count the work once per run for the progress report and restart the
+    # active time clock so that time between a crash and the resume is not
+    # counted.
+    resume = """
+update contacts.password_rotations set
+    remaining=
+        (select count(*)
+            from contacts.urls
+            where urls.password_enc is not null
+                and (urls.data_key_id is null
+                    or (%(fingerprints)s and urls.password_fingerprint is null))
+                and (last_url_id is null or urls.id>last_url_id))+
+        (select count(*)
+            from contacts.data_keys
+            where data_keys.master_key_id<>target_key_id),
+    updated=clock_timestamp()
+where id=%(job)s"""
+
+    finish = """
+update contacts.password_rotations set finished=current_timestamp
+where id=%(job)s"""
+
+    try:
+        with app.dbconn() as conn:
+            locked = api.sql_1row(
+                conn, "select pg_try_advisory_lock(%(k)s)", {"k": ROTATION_LOCK}
+            )
+            conn.commit()
+            started["locked"] = locked
+            started["ready"].set()
+            if not locked:
+                return
+
+            try:
+                params = {"job": job_id}
+                params["fingerprints"] = keys.manager.fingerprints_enabled()
+                api.sql_void(conn, resume, params)
+                conn.commit()
+
+                job = api.sql_1object(conn, select, {"job": job_id})
+                _rewrap_data_keys(conn, job)
+                with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                    while _rotate_batch(conn, pool, job, batch_size):
+                        pass
+
+                api.sql_void(conn, finish, {"job": job_id})
+                conn.commit()
+            finally:
+                conn.rollback()
+                api.sql_void(
+                    conn, "select pg_advisory_unlock(%(k)s)", {"k": ROTATION_LOCK}
+                )
+                conn.commit()
+    finally:
+        started["ready"].set()
+        with _thread_lock:
+            _thread = None
+
+
+@app.put("/api/password/rotation", name="put_api_password_rotation")
+def put_api_password_rotation(request):
+    batch_size = contacts._count_param(
+        request.forms.get("batch_size", 500), "batch_size", MAX_BATCH_SIZE
+    )
+    workers = contacts._count_param(
+        request.forms.get("workers", 4), "workers", MAX_WORKERS
+    )
+
+    # An unfinished job (for example after a crash) is resumed from its
+    # checkpoint unless the current key has changed since it started.
+    select_open = """
+select id, target_key_id
+from contacts.password_rotations
+where finished is null
+order by started desc
+limit 1"""
+
+    insert = """
+insert into contacts.password_rotations (target_key_id)
+values (%(target)s)
+returning id"""
+
+    # a new target key starts the walk and its progress over
+    restart = """
+update contacts.password_rotations set target_key_id=%(target)s, last_url_id=null,
+    started=current_timestamp, rotated=0, errors=0, active_seconds=0
+where id=%(job)s"""
+
+    global _thread
+
+    target = keys.manager.current_key_id()
+
+    with _thread_lock:
+        if _thread is not None:
+            raise api.UserError(
+                "rotation-running", "A password rotation is already running."
+            )
+
+        with app.dbconn() as conn:
+            job = api.sql_1object(conn, select_open)
+            if job is None:
+                job_id = api.sql_1row(conn, insert, {"target": target})
+            else:
+                job_id = job.id
+                if job.target_key_id != target:
+                    api.sql_void(conn, restart, {"job": job_id, "target": target})
+            conn.commit()
+
+        started = {"ready": threading.Event(), "locked": False}
+        _thread = threading.Thread(
+            target=_run_rotation,
+            args=(job_id, batch_size, workers, started),
+            daemon=True,
+        )
+        _thread.start()
+
+    # the job resumes from its checkpoint whichever process runs it
+    started["ready"].wait()
+    if not started["locked"]:
+        raise api.UserError(
+            "rotation-running", "A password rotation is running in another process."
+        )
+
+    results = api.Results()
+    results.keys["job_id"] = job_id
+    return results.json_out()
+
+
+@app.get("/api/password/rotation", name="get_api_password_rotation")
+def get_api_password_rotation():
+    select = """
+select id, target_key_id, started, updated, finished,
+    rotated, errors,
+    rotated/greatest(active_seconds, 1) as per_second,
+    remaining
+from contacts.password_rotations
+order by started desc
+limit 1"""
+
+    results = api.Results()
+    with app.dbconn() as conn:
+        results.tables["rotation", True] = api.sql_tab2(conn, select)
+
+    with _thread_lock:
+        results.keys["running"] = _thread is not None
+    return results.json_out()
@@ -1,33 +1,136 @@
 import uuid
+import threading
+import selectors
 import yenot.backend.api as api
+from . import contacts
 
 app = api.get_global_app()
 
+# pg advisory lock key serializing writes to the tag tree
+TAG_TREE_LOCK = 0x6C637467
 
-@app.get("/api/tags/list", name="get_api_tags_list", report_title="Tag List")
-def get_api_tags_list():
+
+# The whole tag tree is small and read far more often than written, so each
+# process caches it.  put_api_tag notifies TAGS_CHANNEL and a listener
+# thread per process drops the cache on any notification.  Until the
+# listener is running nothing is cached.
+TAGS_CHANNEL = "contacts_tags"
+
+_tree_lock = threading.Lock()
+_tree = None
+_tree_generation = 0
+_listener = None
+
+
+def _invalidate_tree():
+    global _tree, _tree_generation
+
+    with _tree_lock:
+        _tree = None
+        _tree_generation += 1
+
+
+def _listen_tags():
+    global _listener
+
+    try:
+        with app.dbconn() as conn:
+            api.sql_void(conn, f"listen {TAGS_CHANNEL}")
+            conn.commit()
+            # changes before the listen took effect are not known
+            _invalidate_tree()
+
+            with selectors.DefaultSelector() as sel:
+                sel.register(conn, selectors.EVENT_READ)
+                while True:
+                    sel.select(timeout=60)
+                    conn.poll()
+                    if len(conn.notifies) > 0:
+                        conn.notifies.clear()
+                        _invalidate_tree()
+    finally:
+        with _tree_lock:
+            _listener = None
+        _invalidate_tree()
+
+
+def _ensure_listener():
+    global _listener
+
+    with _tree_lock:
+        if _listener is None:
+            _listener = threading.Thread(target=_listen_tags, daemon=True)
+            _listener.start()
+            return False
+        return True
+
+
+def _tag_tree(conn):
+    """
+    Return the (columns, rows) of all tags with their full path from the
+    process cache.
+    """
+    global _tree
+
+    # Tags are walked down from the roots (no parent or a missing parent)
+    # to any depth.  Tags of a legacy parent cycle (see migration 025) are
+    # not reached from a root; they are listed with their own name as path.
     select = r"""
+with recursive tree as (
+    select tags.id, tags.name, tags.parent_id,
+        tags.name::text as path_name,
+        array[tags.id] as path_ids
+    from contacts.tags
+    where not exists (
+        select 1 from contacts.tags tpar where tpar.id=tags.parent_id)
+    union all
+    select tags.id, tags.name, tags.parent_id,
+        tree.path_name||E'\u001C'||tags.name,
+        tree.path_ids||tags.id
+    from contacts.tags
+    join tree on tree.id=tags.parent_id
+    where tags.id<>all(tree.path_ids)
+)
+select tree.name,
+    tree.id,
+    tree.path_name,
+    tree.parent_id
+from tree
+union all
 select tags.name,
     tags.id,
-    concat_ws(E'\u001C', tpar4.name, tpar3.name, tpar2.name, tpar1.name, tags.name) as path_name,
+    tags.name::text as path_name,
     tags.parent_id
 from contacts.tags
-left outer join contacts.tags tpar1 on tpar1.id=tags.parent_id
-left outer join contacts.tags tpar2 on tpar2.id=tpar1.parent_id
-left outer join contacts.tags tpar3 on tpar3.id=tpar2.parent_id
-left outer join contacts.tags tpar4 on tpar4.id=tpar3.parent_id
+where not exists (select 1 from tree where tree.id=tags.id)
 order by path_name
 """
 
-    params = {}
+    listening = _ensure_listener()
+
+    with _tree_lock:
+        if _tree is not None:
+            return _tree
+        generation = _tree_generation
+
+    cm = api.ColumnMap(
+        id=api.cgen.lms_contacts_tag.surrogate(),
+        name=api.cgen.lms_contacts_tag.name(url_key="id", represents=True),
+    )
+    tree = api.sql_tab2(conn, select, {}, cm)
+
+    with _tree_lock:
+        # do not cache a tree read before a change was notified
+        if listening and generation == _tree_generation:
+            _tree = tree
+    return tree
 
+
+@app.get("/api/tags/list", name="get_api_tags_list", report_title="Tag List")
+def get_api_tags_list():
     results = api.Results(default_title=True)
     with app.dbconn() as conn:
-        cm = api.ColumnMap(
-            id=api.cgen.lms_contacts_tag.surrogate(),
-            name=api.cgen.lms_contacts_tag.name(url_key="id", represents=True),
-        )
-        results.tables["tags", True] = api.sql_tab2(conn, select, params, cm)
+        results.tables["tags", True] = _tag_tree(conn)
     return results.json_out()
 
 
@@ -76,6 +179,79 @@ def get_api_tag_new():
     return results.json_out()
 
 
+def _raise_tag_cycle(conn, tag_id, parent_id):
+    select = """
+select count(*)
+from contacts.tag_closure
+where ancestor_id=%(tag)s and descendant_id=%(parent)s"""
+
+    current = """
+select parent_id
+from contacts.tags
+where id=%(tag)s"""
+
+    if parent_id is None:
+        return
+    params = {"tag": tag_id, "parent": parent_id}
+    # re-saving a tag of a legacy cycle (see migration 025) with its parent
+    # unchanged makes no new cycle
+    stored = api.sql_1row(conn, current, params)
+    if stored is not None and str(stored) == str(parent_id):
+        return
+    if parent_id == tag_id or api.sql_1row(conn, select, params) > 0:
+        raise api.UserError(
+            "invalid-input", "A tag cannot be placed under itself or its sub-tags."
+        )
+
+
+def _update_tag_closure(conn, tag_id):
+    """
+    Rebuild the closure rows of the sub-tree under tag_id from the parent_id
+    links of contacts.tags.  This also holds for tags of a legacy cycle
+    whose members are each other's ancestors.
+    """
+    select_subtree = """
+with recursive down as (
+    select %(tag)s::uuid as id, array[%(tag)s::uuid] as path_ids
+    union all
+    select tags.id, down.path_ids||tags.id
+    from contacts.tags
+    join down on tags.parent_id=down.id
+    where tags.id<>all(down.path_ids)
+)
+select array_agg(distinct id)::text[] from (
+    select id from down
+    union
+    select descendant_id from contacts.tag_closure where ancestor_id=%(tag)s
+) subtree"""
+
+    delete_subtree = """
+delete from contacts.tag_closure
+where descendant_id=any(%(subtree)s::uuid[])"""
+
+    insert_subtree = """
+insert into contacts.tag_closure (ancestor_id, descendant_id, depth)
+with recursive up as (
+    select tags.id as descendant_id, tags.id as ancestor_id, tags.parent_id,
+        0 as depth, array[tags.id] as path_ids
+    from contacts.tags
+    where tags.id=any(%(subtree)s::uuid[])
+    union all
+    select up.descendant_id, tpar.id, tpar.parent_id,
+        up.depth+1, up.path_ids||tpar.id
+    from up
+    join contacts.tags tpar on tpar.id=up.parent_id
+    where tpar.id<>all(up.path_ids)
+)
+select ancestor_id, descendant_id, depth
+from up"""
+
+    subtree = api.sql_1row(conn, select_subtree, {"tag": tag_id})
+    params = {"subtree": subtree}
+    api.sql_void(conn, delete_subtree, params)
+    api.sql_void(conn, insert_subtree, params)
+
+
 @app.put("/api/tag/<acnt_id>", name="put_api_tag")
 def put_api_tag(acnt_id):
     acc = api.table_from_tab2("tag")
@@ -86,8 +262,52 @@ def put_api_tag(acnt_id):
         )
 
     with app.dbconn() as conn:
+        # one tag tree write at a time so that concurrent re-parents cannot
+        # make a cycle between them
+        api.sql_void(conn, "select pg_advisory_xact_lock(%(k)s)", {"k": TAG_TREE_LOCK})
+
+        if "parent_id" in acc.DataRow.__slots__:
+            _raise_tag_cycle(conn, acnt_id, acc.rows[0].parent_id)
+
         with api.writeblock(conn) as w:
             w.upsert_rows("contacts.tags", acc)
+        _update_tag_closure(conn, acnt_id)
+
+        api.notify_listener(conn, TAGS_CHANNEL, acnt_id)
+        conn.commit()
+
+    # the notification reaches this process too but may trail the response
+    _invalidate_tree()
+
+    return api.Results().json_out()
+
+
+@app.put("/api/tags/<tag_id>/members", name="put_api_tag_members")
+def put_api_tag_members(request, tag_id):
+    # ;-separated persona ids to add to and remove from the tag
+    add = request.forms.get("add", None)
+    remove = request.forms.get("remove", None)
+
+    adds = [p for p in (add or "").split(";") if p != ""]
+    removes = [p for p in (remove or "").split(";") if p != ""]
+
+    select = """
+select count(*)
+from contacts.tags
+where id=%(tag)s"""
+
+    if len(adds) + len(removes) == 0:
+        raise api.UserError("invalid-param", "Give persona ids to add or remove.")
+
+    (tag_id,) = contacts._parse_uuids([tag_id], "tag_id")
+    adds = [(tag_id, p) for p in adds]
+    removes = [(tag_id, p) for p in removes]
+
+    with app.dbconn() as conn:
+        if api.sql_1row(conn, select, {"tag": tag_id}) == 0:
+            raise api.UserError("invalid-param", "The tag does not exist.")
+
+        contacts._update_persona_tags(conn, adds, removes)
         conn.commit()
 
     return api.Results().json_out()
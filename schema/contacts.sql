@@ -1,4 +1,5 @@
 create extension if not exists "uuid-ossp";
+create extension if not exists pg_trgm;
 
 create schema contacts;
 
@@ -13,10 +14,31 @@ CREATE TABLE contacts.personas (
     anniversary date,
     organization text,
     owner_id uuid references users(id) not null,
+    -- maintained by put_api_persona; see contacts.perfts_search
+    fts_search tsvector,
+    -- fts_search plus the text of all bits; see contacts.bits
+    search_document tsvector,
     constraint chk_corp_names check(not corporate_entity or (f_name is null and title is null and char_length(l_name) >= 2)),
     constraint chk_indiv_names check(corporate_entity or (char_length(l_name)>=2 or char_length(f_name)>=2))
 );
 
+-- immutable so that it can be indexed; see also contacts.personas_calc
+create function contacts.persona_entity_name(title text, f_name text, l_name text)
+returns text language sql immutable as $$
+    select concat_ws(' ',
+        case when title='' then null else title end,
+        case when f_name='' then null else f_name end,
+        case when l_name='' then null else l_name end)
+$$;
+
+CREATE INDEX personas_entity_name_trgm_idx ON contacts.personas
+    USING gin (contacts.persona_entity_name(title, f_name, l_name) gin_trgm_ops);
+CREATE INDEX personas_organization_trgm_idx ON contacts.personas
+    USING gin (organization gin_trgm_ops);
+-- keyset pagination of the persona list
+CREATE INDEX personas_entity_name_idx ON contacts.personas
+    (contacts.persona_entity_name(title, f_name, l_name), id);
+
 CREATE TABLE contacts.persona_shares (
     persona_id uuid not null references contacts.personas(id),
     user_id uuid not null references users(id),
@@ -28,12 +50,30 @@ ALTER TABLE contacts.personas
         references contacts.persona_shares(persona_id, user_id)
         deferrable initially deferred;
 
+-- personas owned by and shared with a user
+CREATE INDEX personas_owner_id_idx ON contacts.personas (owner_id);
+CREATE INDEX persona_shares_user_id_idx ON contacts.persona_shares (user_id);
+
+CREATE INDEX personas_fts_search_idx ON contacts.personas USING gin (fts_search);
+CREATE INDEX personas_search_document_idx ON contacts.personas USING gin (search_document);
+
 CREATE TABLE contacts.tags (
     id uuid primary key default uuid_generate_v1mc(),
     name character varying(40) not null check(char_length(name)>=2),
     parent_id uuid
 );
 
+-- every (ancestor, descendant) pair of the tag tree including each tag with
+-- itself at depth 0; maintained by put_api_tag
+CREATE TABLE contacts.tag_closure (
+    ancestor_id uuid not null references contacts.tags(id),
+    descendant_id uuid not null references contacts.tags(id),
+    depth integer not null,
+    primary key (ancestor_id, descendant_id)
+);
+
+CREATE INDEX tag_closure_descendant_id_idx ON contacts.tag_closure (descendant_id);
+
 CREATE TABLE contacts.personaassoc (
     umbrella_persona_id uuid NOT NULL references contacts.personas(id),
     individual_persona_id uuid NOT NULL references contacts.personas(id)
@@ -41,9 +81,12 @@ CREATE TABLE contacts.personaassoc (
 
 CREATE TABLE contacts.tagpersona (
     tag_id uuid not null references contacts.tags(id),
-    persona_id uuid not null references contacts.personas(id)
+    persona_id uuid not null references contacts.personas(id),
+    primary key (tag_id, persona_id)
 );
 
+CREATE INDEX tagpersona_persona_id_idx ON contacts.tagpersona (persona_id);
+
 CREATE SEQUENCE bit_index_seq AS integer START WITH 100;
 
 CREATE TABLE contacts.email_addresses (
@@ -56,6 +99,12 @@ CREATE TABLE contacts.email_addresses (
     email character varying(60)
 );
 
+CREATE INDEX email_addresses_persona_id_idx ON contacts.email_addresses (persona_id);
+
+-- reverse (sender address) lookups
+CREATE INDEX email_addresses_lower_email_idx ON contacts.email_addresses
+    (lower(email));
+
 CREATE TABLE contacts.phone_numbers (
     id uuid primary key default uuid_generate_v1mc(),
     persona_id uuid not null references contacts.personas(id),
@@ -63,9 +112,17 @@ CREATE TABLE contacts.phone_numbers (
     is_primary boolean not null default false,
     name text,
     memo text,
-    number character varying(18)
+    number character varying(18),
+    -- E.164 style digits of number; maintained by put_api_persona_bit
+    number_digits character varying(18)
 );
 
+CREATE INDEX phone_numbers_persona_id_idx ON contacts.phone_numbers (persona_id);
+
+-- suffix (trailing digits) lookups for caller-id
+CREATE INDEX phone_numbers_number_digits_idx ON contacts.phone_numbers
+    (reverse(number_digits) text_pattern_ops);
+
 CREATE TABLE contacts.street_addresses (
     id uuid primary key default uuid_generate_v1mc(),
     persona_id uuid not null references contacts.personas(id),
@@ -81,6 +138,19 @@ CREATE TABLE contacts.street_addresses (
     country text
 );
 
+CREATE INDEX street_addresses_persona_id_idx ON contacts.street_addresses (persona_id);
+
+-- per owner Fernet data keys wrapped by a master key; see lcserver.keys.DataKeys
+CREATE TABLE contacts.data_keys (
+    id uuid primary key default uuid_generate_v1mc(),
+    owner_id uuid not null references users(id),
+    wrapped_key bytea not null,
+    -- lcserver.keys.key_id of the master key which wrapped wrapped_key
+    master_key_id character varying(16) not null,
+    created timestamp with time zone not null default current_timestamp,
+    unique (owner_id)
+);
+
 CREATE TABLE contacts.urls (
     id uuid primary key default uuid_generate_v1mc(),
     persona_id uuid not null references contacts.personas(id),
@@ -91,31 +161,62 @@ CREATE TABLE contacts.urls (
     url character varying(150),
     username character varying(50),
     password_enc bytea,
+    -- lcserver.keys.key_id of the key which encrypted password_enc
+    password_key_id character varying(16),
+    -- contacts.data_keys id of the owner key which encrypted password_enc;
+    -- null for passwords encrypted directly with a master key
+    data_key_id uuid references contacts.data_keys(id),
+    -- keyed hmac of the password for reuse reports; see KeyManager.fingerprint
+    password_fingerprint bytea,
     pw_reset_dt date,
-    pw_next_reset_dt date
+    pw_next_reset_dt date,
+    -- host of url with labels reversed; maintained by put_api_persona_bit
+    url_host_rev text
+);
+
+CREATE INDEX urls_persona_id_idx ON contacts.urls (persona_id);
+
+-- autofill lookups by page host
+CREATE INDEX urls_url_host_rev_idx ON contacts.urls (url_host_rev);
+
+-- passwords due for reset
+CREATE INDEX urls_pw_next_reset_dt_idx ON contacts.urls (pw_next_reset_dt)
+    WHERE pw_next_reset_dt is not null;
+
+-- groups of reused passwords
+CREATE INDEX urls_password_fingerprint_idx ON contacts.urls (password_fingerprint)
+    WHERE password_fingerprint is not null;
+
+-- progress of the bulk password re-encryption in lcserver/rotation.py
+CREATE TABLE contacts.password_rotations (
+    id uuid primary key default uuid_generate_v1mc(),
+    target_key_id character varying(16) not null,
+    started timestamp with time zone not null default current_timestamp,
+    updated timestamp with time zone not null default current_timestamp,
+    finished timestamp with time zone,
+    last_url_id uuid,
+    rotated integer not null default 0,
+    errors integer not null default 0,
+    -- work left as counted at the start of the current run
+    remaining integer,
+    -- running time excluding any gap between a crash and the resume
+    active_seconds double precision not null default 0
+);
+
+create aggregate contacts.tsvector_agg(tsvector) (
+    sfunc = tsvector_concat,
+    stype = tsvector,
+    initcond = ''
 );
 
 create view contacts.perfts_search as
-select id,
-    to_tsvector(coalesce(l_name, ''))||
-    to_tsvector(coalesce(f_name, ''))||
-    to_tsvector(coalesce(organization, ''))||
-    to_tsvector(coalesce(title, ''))||
-    to_tsvector(coalesce(memo, '')) as fts_search
+select id, fts_search
 from contacts.personas;
 
 create view contacts.personas_calc as
 select personas.*,
-    to_tsvector(coalesce(l_name, ''))||
-    to_tsvector(coalesce(f_name, ''))||
-    to_tsvector(coalesce(organization, ''))||
-    to_tsvector(coalesce(title, ''))||
-    to_tsvector(coalesce(memo, '')) as fts_search,
     -- see also constraints related to corporate_entity & f_name
-    concat_ws(' ',
-        case when personas.title='' then null else personas.title end,
-        case when personas.f_name='' then null else personas.f_name end,
-        case when personas.l_name='' then null else personas.l_name end) as entity_name
+    contacts.persona_entity_name(personas.title, personas.f_name, personas.l_name) as entity_name
 from contacts.personas;
 
 create view contacts.bits as
@@ -125,11 +226,14 @@ create view contacts.bits as
         bit_sequence,
         to_tsvector(coalesce(memo, ''))||
         to_tsvector(coalesce(name, ''))||
-        to_tsvector(coalesce(url, '')) as fts_search,
+        to_tsvector(coalesce(url, ''))||
+        to_tsvector(coalesce(substring(lower(url) from '^(?:[a-z]+://)?(?:www\.)?([^/:?#]+)'), '')) as fts_search,
         json_build_object(
                 'url', url,
                 'username', username,
                 'password_enc', password_enc,
+                'password_key_id', password_key_id,
+                'data_key_id', data_key_id,
                 'pw_reset_dt', pw_reset_dt,
                 'pw_next_reset_dt', pw_next_reset_dt) as bit_data
     from contacts.urls
@@ -141,7 +245,9 @@ create view contacts.bits as
         to_tsvector(coalesce(name, ''))||
         to_tsvector(coalesce(address1, ''))||
         to_tsvector(coalesce(address2, ''))||
-        to_tsvector(coalesce(city, '')) as fts_search,
+        to_tsvector(coalesce(city, ''))||
+        to_tsvector(coalesce(state, ''))||
+        to_tsvector(coalesce(zip, '')) as fts_search,
         json_build_object(
                 'address1', address1,
                 'address2', address2,
@@ -155,7 +261,8 @@ create view contacts.bits as
         name, memo, is_primary,
         bit_sequence,
         to_tsvector(coalesce(memo, ''))||
-        to_tsvector(coalesce(name, '')) as fts_search,
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(number, '')) as fts_search,
         json_build_object(
                 'number', number) as bit_data
     from contacts.phone_numbers
@@ -164,7 +271,9 @@ create view contacts.bits as
         name, memo, is_primary,
         bit_sequence,
         to_tsvector(coalesce(memo, ''))||
-        to_tsvector(coalesce(name, '')) as fts_search,
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(email, ''))||
+        to_tsvector(coalesce(split_part(email, '@', 2), '')) as fts_search,
         json_build_object(
                 'email', email) as bit_data
     from contacts.email_addresses
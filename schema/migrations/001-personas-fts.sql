@@ -0,0 +1,47 @@
+-- Persist the persona full-text search vector and index it.
+--
+-- Run with psql (outside of an explicit transaction) so that the backfill can
+-- commit per batch and the index can be built concurrently.
+
+alter table contacts.personas add column if not exists fts_search tsvector;
+
+do $$
+declare
+    batch_count integer;
+begin
+    loop
+        update contacts.personas set fts_search=
+            to_tsvector(coalesce(l_name, ''))||
+            to_tsvector(coalesce(f_name, ''))||
+            to_tsvector(coalesce(organization, ''))||
+            to_tsvector(coalesce(title, ''))||
+            to_tsvector(coalesce(memo, ''))
+        where id in (
+            select id
+            from contacts.personas
+            where fts_search is null
+            limit 5000);
+
+        get diagnostics batch_count = row_count;
+        exit when batch_count = 0;
+        commit;
+    end loop;
+end$$;
+
+create index concurrently if not exists personas_fts_search_idx
+    on contacts.personas using gin (fts_search);
+
+create or replace view contacts.perfts_search as
+select id, fts_search
+from contacts.personas;
+
+-- personas.* now ends with the stored fts_search column so the column list is
+-- unchanged and the view can be replaced in place.
+create or replace view contacts.personas_calc as
+select personas.*,
+    -- see also constraints related to corporate_entity & f_name
+    concat_ws(' ',
+        case when personas.title='' then null else personas.title end,
+        case when personas.f_name='' then null else personas.f_name end,
+        case when personas.l_name='' then null else personas.l_name end) as entity_name
+from contacts.personas;
@@ -0,0 +1,116 @@
+-- Combine persona and bit text in one indexed search document per persona.
+--
+-- create or replace aggregate requires PostgreSQL 12 or later.
+--
+-- Run with psql (outside of an explicit transaction) so that the backfill can
+-- commit per batch and the index can be built concurrently.
+
+create or replace aggregate contacts.tsvector_agg(tsvector) (
+    sfunc = tsvector_concat,
+    stype = tsvector,
+    initcond = ''
+);
+
+alter table contacts.personas add column if not exists search_document tsvector;
+
+-- personas.* gained a column ahead of entity_name so the view must be rebuilt
+-- rather than replaced.
+drop view if exists contacts.personas_calc;
+
+create view contacts.personas_calc as
+select personas.*,
+    -- see also constraints related to corporate_entity & f_name
+    concat_ws(' ',
+        case when personas.title='' then null else personas.title end,
+        case when personas.f_name='' then null else personas.f_name end,
+        case when personas.l_name='' then null else personas.l_name end) as entity_name
+from contacts.personas;
+
+-- emails, phone numbers and host names now contribute to fts_search
+create or replace view contacts.bits as
+(
+    select id, persona_id, 'urls' as bit_type,
+        name, memo, is_primary,
+        bit_sequence,
+        to_tsvector(coalesce(memo, ''))||
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(url, ''))||
+        to_tsvector(coalesce(substring(lower(url) from '^(?:[a-z]+://)?(?:www\.)?([^/:?#]+)'), '')) as fts_search,
+        json_build_object(
+                'url', url,
+                'username', username,
+                'password_enc', password_enc,
+                'pw_reset_dt', pw_reset_dt,
+                'pw_next_reset_dt', pw_next_reset_dt) as bit_data
+    from contacts.urls
+)union all(
+    select id, persona_id, 'street_addresses' as bit_type,
+        name, memo, is_primary,
+        bit_sequence,
+        to_tsvector(coalesce(memo, ''))||
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(address1, ''))||
+        to_tsvector(coalesce(address2, ''))||
+        to_tsvector(coalesce(city, ''))||
+        to_tsvector(coalesce(state, ''))||
+        to_tsvector(coalesce(zip, '')) as fts_search,
+        json_build_object(
+                'address1', address1,
+                'address2', address2,
+                'city', city,
+                'state', state,
+                'zip', zip,
+                'country', country) as bit_data
+    from contacts.street_addresses
+)union all(
+    select id, persona_id, 'phone_numbers' as bit_type,
+        name, memo, is_primary,
+        bit_sequence,
+        to_tsvector(coalesce(memo, ''))||
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(number, '')) as fts_search,
+        json_build_object(
+                'number', number) as bit_data
+    from contacts.phone_numbers
+)union all(
+    select id, persona_id, 'email_addresses' as bit_type,
+        name, memo, is_primary,
+        bit_sequence,
+        to_tsvector(coalesce(memo, ''))||
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(email, ''))||
+        to_tsvector(coalesce(split_part(email, '@', 2), '')) as fts_search,
+        json_build_object(
+                'email', email) as bit_data
+    from contacts.email_addresses
+);
+
+
+do $$
+declare
+    batch_count integer;
+begin
+    loop
+        update contacts.personas set search_document=
+            setweight(coalesce(personas.fts_search, ''), 'A')||
+            setweight(coalesce(bitfts.fts_search, ''), 'B')
+        from (
+            select p2.id, contacts.tsvector_agg(bits.fts_search) as fts_search
+            from contacts.personas p2
+            left outer join contacts.bits on bits.persona_id=p2.id
+            where p2.id in (
+                select id
+                from contacts.personas
+                where search_document is null
+                limit 5000)
+            group by p2.id) bitfts
+        where personas.id=bitfts.id;
+
+        get diagnostics batch_count = row_count;
+        exit when batch_count = 0;
+        commit;
+    end loop;
+end$$;
+
+create index concurrently if not exists personas_search_document_idx
+    on contacts.personas using gin (search_document);
@@ -0,0 +1,27 @@
+-- Trigram indexes for contact-name type-ahead.
+--
+-- Run with psql (outside of an explicit transaction) so that the indexes can
+-- be built concurrently.
+
+create extension if not exists pg_trgm;
+
+create or replace function contacts.persona_entity_name(title text, f_name text, l_name text)
+returns text language sql immutable as $$
+    select concat_ws(' ',
+        case when title='' then null else title end,
+        case when f_name='' then null else f_name end,
+        case when l_name='' then null else l_name end)
+$$;
+
+create or replace view contacts.personas_calc as
+select personas.*,
+    -- see also constraints related to corporate_entity & f_name
+    contacts.persona_entity_name(personas.title, personas.f_name, personas.l_name) as entity_name
+from contacts.personas;
+
+create index concurrently if not exists personas_entity_name_trgm_idx
+    on contacts.personas
+    using gin (contacts.persona_entity_name(title, f_name, l_name) gin_trgm_ops);
+create index concurrently if not exists personas_organization_trgm_idx
+    on contacts.personas
+    using gin (organization gin_trgm_ops);
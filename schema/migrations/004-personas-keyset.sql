@@ -0,0 +1,8 @@
+-- Sort-key index for keyset pagination of /api/personas/list.
+--
+-- Run with psql (outside of an explicit transaction) so that the index can be
+-- built concurrently.
+
+create index concurrently if not exists personas_entity_name_idx
+    on contacts.personas
+    (contacts.persona_entity_name(title, f_name, l_name), id);
@@ -0,0 +1,37 @@
+-- Normalized phone digits for caller-id lookup.
+--
+-- Run with psql (outside of an explicit transaction) so that the backfill can
+-- commit per batch and the index can be built concurrently.  The backfill
+-- mirrors lcserver.contacts.normalize_phone.
+
+alter table contacts.phone_numbers
+    add column if not exists number_digits character varying(18);
+
+do $$
+declare
+    batch_count integer;
+begin
+    loop
+        update contacts.phone_numbers set number_digits=
+            case
+                when btrim(phone_numbers.number) like '+%' then normal.digits
+                when normal.digits like '011%' then substr(normal.digits, 4)
+                when length(normal.digits)=10 then '1'||normal.digits
+                else normal.digits
+            end
+        from (
+            select id, regexp_replace(number, '\D', '', 'g') as digits
+            from contacts.phone_numbers
+            where number is not null and number_digits is null
+                and regexp_replace(number, '\D', '', 'g')<>''
+            limit 5000) normal
+        where phone_numbers.id=normal.id;
+
+        get diagnostics batch_count = row_count;
+        exit when batch_count = 0;
+        commit;
+    end loop;
+end$$;
+
+create index concurrently if not exists phone_numbers_number_digits_idx
+    on contacts.phone_numbers (reverse(number_digits) text_pattern_ops);
@@ -0,0 +1,7 @@
+-- Case-insensitive index for reverse email lookup.
+--
+-- Run with psql (outside of an explicit transaction) so that the index can be
+-- built concurrently.
+
+create index concurrently if not exists email_addresses_lower_email_idx
+    on contacts.email_addresses (lower(email));
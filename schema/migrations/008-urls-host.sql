@@ -0,0 +1,37 @@
+-- Reversed-host column for url autofill lookups.
+--
+-- Run with psql (outside of an explicit transaction) so that the backfill can
+-- commit per batch and the index can be built concurrently.  The backfill
+-- mirrors lcserver.contacts.url_host_reversed.
+
+alter table contacts.urls add column if not exists url_host_rev text;
+
+do $$
+declare
+    batch_count integer;
+begin
+    loop
+        update contacts.urls set url_host_rev=
+            array_to_string(array(
+                select label
+                from unnest(string_to_array(hosts.host, '.')) with ordinality t(label, n)
+                order by n desc), '.')
+        from (
+            select id,
+                regexp_replace(
+                    substring(lower(url) from '^(?:[a-z][a-z0-9+.-]*://)?(?:[^@/]*@)?([^/:?#]+)'),
+                    '^www\.', '') as host
+            from contacts.urls
+            where url_host_rev is null
+                and substring(lower(url) from '^(?:[a-z][a-z0-9+.-]*://)?(?:[^@/]*@)?([^/:?#]+)')<>''
+            limit 5000) hosts
+        where urls.id=hosts.id;
+
+        get diagnostics batch_count = row_count;
+        exit when batch_count = 0;
+        commit;
+    end loop;
+end$$;
+
+create index concurrently if not exists urls_url_host_rev_idx
+    on contacts.urls (url_host_rev);
@@ -0,0 +1,67 @@
+-- Record the key version of each encrypted password.
+--
+-- Existing ciphertexts keep a null password_key_id and are decrypted by
+-- trying each key until they are rotated (which records the key).
+
+alter table contacts.urls
+    add column if not exists password_key_id character varying(16);
+
+create or replace view contacts.bits as
+(
+    select id, persona_id, 'urls' as bit_type,
+        name, memo, is_primary,
+        bit_sequence,
+        to_tsvector(coalesce(memo, ''))||
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(url, ''))||
+        to_tsvector(coalesce(substring(lower(url) from '^(?:[a-z]+://)?(?:www\.)?([^/:?#]+)'), '')) as fts_search,
+        json_build_object(
+                'url', url,
+                'username', username,
+                'password_enc', password_enc,
+                'password_key_id', password_key_id,
+                'pw_reset_dt', pw_reset_dt,
+                'pw_next_reset_dt', pw_next_reset_dt) as bit_data
+    from contacts.urls
+)union all(
+    select id, persona_id, 'street_addresses' as bit_type,
+        name, memo, is_primary,
+        bit_sequence,
+        to_tsvector(coalesce(memo, ''))||
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(address1, ''))||
+        to_tsvector(coalesce(address2, ''))||
+        to_tsvector(coalesce(city, ''))||
+        to_tsvector(coalesce(state, ''))||
+        to_tsvector(coalesce(zip, '')) as fts_search,
+        json_build_object(
+                'address1', address1,
+                'address2', address2,
+                'city', city,
+                'state', state,
+                'zip', zip,
+                'country', country) as bit_data
+    from contacts.street_addresses
+)union all(
+    select id, persona_id, 'phone_numbers' as bit_type,
+        name, memo, is_primary,
+        bit_sequence,
+        to_tsvector(coalesce(memo, ''))||
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(number, '')) as fts_search,
+        json_build_object(
+                'number', number) as bit_data
+    from contacts.phone_numbers
+)union all(
+    select id, persona_id, 'email_addresses' as bit_type,
+        name, memo, is_primary,
+        bit_sequence,
+        to_tsvector(coalesce(memo, ''))||
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(email, ''))||
+        to_tsvector(coalesce(split_part(email, '@', 2), '')) as fts_search,
+        json_build_object(
+                'email', email) as bit_data
+    from contacts.email_addresses
+);
+
@@ -0,0 +1,12 @@
+-- Checkpoint table for the bulk password re-encryption job.
+
+CREATE TABLE contacts.password_rotations (
+    id uuid primary key default uuid_generate_v1mc(),
+    target_key_id character varying(16) not null,
+    started timestamp with time zone not null default current_timestamp,
+    updated timestamp with time zone not null default current_timestamp,
+    finished timestamp with time zone,
+    last_url_id uuid,
+    rotated integer not null default 0,
+    errors integer not null default 0
+);
@@ -0,0 +1,76 @@
+-- Envelope encryption of passwords with a data key per owner.
+--
+-- Existing ciphertexts keep a null data_key_id and are decrypted with the
+-- master keys until the rotation job moves them under their owner's data key.
+
+CREATE TABLE contacts.data_keys (
+    id uuid primary key default uuid_generate_v1mc(),
+    owner_id uuid not null references users(id),
+    wrapped_key bytea not null,
+    master_key_id character varying(16) not null,
+    created timestamp with time zone not null default current_timestamp,
+    unique (owner_id)
+);
+
+alter table contacts.urls
+    add column if not exists data_key_id uuid references contacts.data_keys(id);
+create or replace view contacts.bits as
+(
+    select id, persona_id, 'urls' as bit_type,
+        name, memo, is_primary,
+        bit_sequence,
+        to_tsvector(coalesce(memo, ''))||
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(url, ''))||
+        to_tsvector(coalesce(substring(lower(url) from '^(?:[a-z]+://)?(?:www\.)?([^/:?#]+)'), '')) as fts_search,
+        json_build_object(
+                'url', url,
+                'username', username,
+                'password_enc', password_enc,
+                'password_key_id', password_key_id,
+                'data_key_id', data_key_id,
+                'pw_reset_dt', pw_reset_dt,
+                'pw_next_reset_dt', pw_next_reset_dt) as bit_data
+    from contacts.urls
+)union all(
+    select id, persona_id, 'street_addresses' as bit_type,
+        name, memo, is_primary,
+        bit_sequence,
+        to_tsvector(coalesce(memo, ''))||
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(address1, ''))||
+        to_tsvector(coalesce(address2, ''))||
+        to_tsvector(coalesce(city, ''))||
+        to_tsvector(coalesce(state, ''))||
+        to_tsvector(coalesce(zip, '')) as fts_search,
+        json_build_object(
+                'address1', address1,
+                'address2', address2,
+                'city', city,
+                'state', state,
+                'zip', zip,
+                'country', country) as bit_data
+    from contacts.street_addresses
+)union all(
+    select id, persona_id, 'phone_numbers' as bit_type,
+        name, memo, is_primary,
+        bit_sequence,
+        to_tsvector(coalesce(memo, ''))||
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(number, '')) as fts_search,
+        json_build_object(
+                'number', number) as bit_data
+    from contacts.phone_numbers
+)union all(
+    select id, persona_id, 'email_addresses' as bit_type,
+        name, memo, is_primary,
+        bit_sequence,
+        to_tsvector(coalesce(memo, ''))||
+        to_tsvector(coalesce(name, ''))||
+        to_tsvector(coalesce(email, ''))||
+        to_tsvector(coalesce(split_part(email, '@', 2), '')) as fts_search,
+        json_build_object(
+                'email', email) as bit_data
+    from contacts.email_addresses
+);
+
@@ -0,0 +1,11 @@
+-- Keyed fingerprints of passwords to find reuse without decrypting.
+--
+-- Existing passwords have a null fingerprint until the rotation job fills
+-- it in.  Run with psql (outside of an explicit transaction) so that the
+-- index can be built concurrently.
+
+alter table contacts.urls add column if not exists password_fingerprint bytea;
+
+create index concurrently if not exists urls_password_fingerprint_idx
+    on contacts.urls (password_fingerprint)
+    where password_fingerprint is not null;
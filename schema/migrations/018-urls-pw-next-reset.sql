@@ -0,0 +1,8 @@
+-- Index for the passwords due for reset report.
+--
+-- Run with psql (outside of an explicit transaction) so that the index can
+-- be built concurrently.
+
+create index concurrently if not exists urls_pw_next_reset_dt_idx
+    on contacts.urls (pw_next_reset_dt)
+    where pw_next_reset_dt is not null;
@@ -0,0 +1,23 @@
+-- Indexes on the foreign keys and filter columns of the hot queries.
+--
+-- Run with psql (outside of an explicit transaction) so that the indexes can
+-- be built concurrently on a live database.  See tests/test_query_plans.py.
+
+create index concurrently if not exists personas_owner_id_idx
+    on contacts.personas (owner_id);
+create index concurrently if not exists persona_shares_user_id_idx
+    on contacts.persona_shares (user_id);
+
+create index concurrently if not exists tagpersona_tag_id_idx
+    on contacts.tagpersona (tag_id);
+create index concurrently if not exists tagpersona_persona_id_idx
+    on contacts.tagpersona (persona_id);
+
+create index concurrently if not exists email_addresses_persona_id_idx
+    on contacts.email_addresses (persona_id);
+create index concurrently if not exists phone_numbers_persona_id_idx
+    on contacts.phone_numbers (persona_id);
+create index concurrently if not exists street_addresses_persona_id_idx
+    on contacts.street_addresses (persona_id);
+create index concurrently if not exists urls_persona_id_idx
+    on contacts.urls (persona_id);
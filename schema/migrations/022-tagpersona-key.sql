@@ -0,0 +1,17 @@
+-- Primary key on contacts.tagpersona.
+--
+-- Duplicate rows are removed first.  The primary key index also serves the
+-- lookups by tag_id so the index of migration 021 is dropped.
+
+delete from contacts.tagpersona
+where ctid in (
+    select ctid
+    from (
+        select ctid,
+            row_number() over (partition by tag_id, persona_id) as n
+        from contacts.tagpersona) dups
+    where dups.n>1);
+
+alter table contacts.tagpersona add primary key (tag_id, persona_id);
+
+drop index if exists contacts.tagpersona_tag_id_idx;
@@ -0,0 +1,29 @@
+-- Closure table of the tag tree for tag and descendant filters.
+--
+-- Tags of an existing parent cycle are recorded as ancestors of each other;
+-- put_api_tag refuses to create new cycles and rebuilds the rows of a saved
+-- tag's sub-tree from the parent links with the same walk as below.
+
+CREATE TABLE contacts.tag_closure (
+    ancestor_id uuid not null references contacts.tags(id),
+    descendant_id uuid not null references contacts.tags(id),
+    depth integer not null,
+    primary key (ancestor_id, descendant_id)
+);
+
+CREATE INDEX tag_closure_descendant_id_idx ON contacts.tag_closure (descendant_id);
+
+insert into contacts.tag_closure (ancestor_id, descendant_id, depth)
+with recursive up as (
+    select tags.id as descendant_id, tags.id as ancestor_id, tags.parent_id,
+        0 as depth, array[tags.id] as path_ids
+    from contacts.tags
+    union all
+    select up.descendant_id, tpar.id, tpar.parent_id,
+        up.depth+1, up.path_ids||tpar.id
+    from up
+    join contacts.tags tpar on tpar.id=up.parent_id
+    where tpar.id<>all(up.path_ids)
+)
+select ancestor_id, descendant_id, depth
+from up;
@@ -0,0 +1,5 @@
+-- Progress of the password rotation job without a scan per poll.
+
+alter table contacts.password_rotations
+    add column if not exists remaining integer,
+    add column if not exists active_seconds double precision not null default 0;
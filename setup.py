@@ -10,5 +10,6 @@ setup(
     author_email="joel@kiwistrawberry.us",
     url="https://bitbucket.org/jbmohler/lmscontacts",
     packages=["lcserver"],
+    package_data={"lcserver": ["word_list.dat"]},
     install_requires=["yenot", "cryptography"],
 )
@@ -0,0 +1,148 @@
+import os
+import pytest
+
+
+class RecordingCursor:
+    def __init__(self, recorder, cursor):
+        self._recorder = recorder
+        self._cursor = cursor
+
+    def execute(self, sql, params=None):
+        self._recorder.statements.append((sql, params))
+        return self._cursor.execute(sql, params)
+
+    def __getattr__(self, attr):
+        return getattr(self._cursor, attr)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._cursor.close()
+
+
+class RecordingConnection:
+    """
+    Wrap a psycopg2 connection and record each statement executed through
+    its cursors.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.statements = []
+
+    def cursor(self, *args, **kwargs):
+        return RecordingCursor(self, self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, attr):
+        return getattr(self._conn, attr)
+
+
+class UncommittedConnection:
+    """
+    Wrap a psycopg2 connection ignoring commit so that code which commits
+    as it goes can be tested and still rolled back.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self):
+        pass
+
+    def __getattr__(self, attr):
+        return getattr(self._conn, attr)
+
+
+@pytest.fixture(scope="session")
+def dburl():
+    if "YENOT_DB_URL" not in os.environ:
+        pytest.skip("YENOT_DB_URL is not set")
+    return os.environ["YENOT_DB_URL"]
+
+
+@pytest.fixture(scope="session")
+def contacts(dburl):
+    import cryptography.fernet
+    import yenot.backend
+
+    if "LMS_CONTACTS_KEY" not in os.environ:
+        key = cryptography.fernet.Fernet.generate_key()
+        os.environ["LMS_CONTACTS_KEY"] = key.decode("ascii")
+    if "LMS_CONTACTS_KEY_FINGERPRINT" not in os.environ:
+        os.environ["LMS_CONTACTS_KEY_FINGERPRINT"] = "test-fingerprint-key"
+
+    yenot.backend.init_application(dburl)
+    import lcserver.contacts
+
+    return lcserver.contacts
+
+
+@pytest.fixture(scope="session")
+def reports(contacts):
+    import lcserver.reports
+
+    return lcserver.reports
+
+
+@pytest.fixture
+def dbconn(dburl):
+    """
+    A connection to an initialized contacts database; everything written
+    through it is rolled back at the end of the test.
+    """
+    import psycopg2
+
+    conn = psycopg2.connect(dburl)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("select to_regclass('contacts.personas') is not null")
+        if not cursor.fetchone()[0]:
+            pytest.skip("the database does not have the contacts schema")
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+@pytest.fixture
+def seeded(contacts, dbconn):
+    """
+    Insert a persona with a url (with a password) and a phone bit shared
+    with (and owned by) a user of the database.
+    """
+    seed = """
+with owner as (
+    select id from users order by username limit 1
+), persona as (
+    insert into contacts.personas (l_name, f_name, owner_id)
+    select 'Teach', 'Edward', owner.id from owner
+    returning id, owner_id
+), share as (
+    insert into contacts.persona_shares (persona_id, user_id)
+    select id, owner_id from persona
+), url as (
+    insert into contacts.urls (persona_id, name, url)
+    select id, 'Ship', 'https://revenge.example.com' from persona
+    returning id
+), phone as (
+    insert into contacts.phone_numbers (persona_id, name, number)
+    select id, 'Cell', '555-0100' from persona
+)
+select persona.id, persona.owner_id, url.id from persona, url"""
+
+    password = """
+update contacts.urls set password_enc=%(penc)s, data_key_id=%(dkid)s
+where id=%(id)s"""
+
+    cursor = dbconn.cursor()
+    cursor.execute(seed)
+    persona_id, user_id, url_id = cursor.fetchone()
+
+    dkeys = contacts.keys.DataKeys(dbconn)
+    penc, dkid = dkeys.encrypt(user_id, b"queen-annes-revenge")
+    cursor.execute(password, {"penc": penc, "dkid": dkid, "id": url_id})
+    return {"persona_id": persona_id, "user_id": user_id, "url_id": url_id}
@@ -112,11 +112,43 @@ def test_crud_bits(srvparams):
         content = client.get("api/persona/{}", found.id)
         assert content.named_table("bits").rows[0].name == "Inbound"
 
+        content = client.get("api/urls/lookup", url="https://jack.pirate.com/login")
+        assert "Inbound" in [row.name for row in content.main_table().rows]
+        content = client.get("api/urls/lookup", url="https://mail.jack.pirate.com/")
+        assert "Inbound" in [row.name for row in content.main_table().rows]
+        content = client.get("api/urls/lookup", url="https://pirate.com/")
+        assert "Inbound" not in [row.name for row in content.main_table().rows]
+
+        # bit text is part of the persona search document
+        content = client.get("api/personas/list", frag="inbound")
+        assert "Barbossa" in [row.l_name for row in content.main_table().rows]
+
+        content = client.get(
+            "api/persona/{}/bit/new", found.id, bit_type="phone_numbers"
+        )
+        phonetable = content.main_table()
+        phonerow = phonetable.rows[0]
+        phonerow.name = "Ship"
+        phonerow.number = "(717) 555-1212"
+        client.put(
+            "api/persona/{}/bit/{}",
+            found.id,
+            phonerow.id,
+            files={"bit": phonetable.as_http_post_file()},
+        )
+
+        content = client.get("api/phone/lookup", number="+1 717.555.1212")
+        assert found.id in [row.persona_id for row in content.main_table().rows]
+
+        client.delete("api/persona/{}/bit/{}", found.id, phonerow.id)
         client.delete("api/persona/{}/bit/{}", found.id, bitrow.id)
 
         content = client.get("api/persona/{}", found.id)
         assert 0 == len(content.named_table("bits").rows)
 
+        content = client.get("api/personas/list", frag="inbound")
+        assert "Barbossa" not in [row.l_name for row in content.main_table().rows]
+
         session.close()
 
 
@@ -130,16 +162,95 @@ def test_basic_lists(srvparams):
         assert "Barbossa" in [row.l_name for row in table.rows]
         assert "Graham" not in [row.l_name for row in table.rows]
 
+        content = client.get(
+            "api/personas/list", frag="pirates", order="relevance", top=5
+        )
+        table = content.main_table()
+        assert table.rows[0].l_name == "Barbossa"
+        assert table.rows[0].rank > 0
+
         content = client.get("api/personas/list", frag="grace")
         table = content.main_table()
         assert "Barbossa" not in [row.l_name for row in table.rows]
         assert "Graham" in [row.l_name for row in table.rows]
 
+        content = client.get("api/personas/list")
+        everything = [row.id for row in content.main_table().rows]
+        paged = []
+        content = client.get("api/personas/list", limit=1)
+        while len(content.main_table().rows) > 0:
+            paged += [row.id for row in content.main_table().rows]
+            if "after" not in content.keys:
+                break
+            content = client.get(
+                "api/personas/list", limit=1, after=content.keys["after"]
+            )
+        assert paged == everything
+
+        content = client.get("api/personas/typeahead", frag="barbos", limit=5)
+        table = content.main_table()
+        assert "Hector Barbossa" in [row.entity_name for row in table.rows]
+
         client.get("api/tags/list")
 
         session.close()
 
 
+def test_tag_members(srvparams):
+    with yenot.tests.server_running(**srvparams) as server:
+        session = yclient.YenotSession(server.url)
+        client = session.std_client()
+
+        content = client.get("api/tag/new")
+        tagtable = content.named_table("tag")
+        tagrow = tagtable.rows[0]
+        tagrow.name = "Black Pearl Crew"
+        tag_id = tagrow.id
+        client.put("api/tag/{}", tag_id, files={"tag": tagtable.as_http_post_file()})
+
+        content = client.get("api/persona/new")
+        pertable = content.named_table("persona")
+        perrow = pertable.rows[0]
+        perrow.l_name = "Gibbs"
+        perrow.f_name = "Joshamee"
+        gibbs_id = perrow.id
+        client.put(
+            "api/persona/{}", perrow.id, files={"persona": pertable.as_http_post_file()}
+        )
+
+        # adding twice is harmless
+        client.put("api/tags/{}/members", tag_id, data={"add": gibbs_id})
+        client.put("api/tags/{}/members", tag_id, data={"add": gibbs_id})
+        content = client.get("api/personas/list", tag_id=tag_id)
+        assert [row.id for row in content.main_table().rows] == [gibbs_id]
+
+        client.put("api/tags/{}/members", tag_id, data={"remove": gibbs_id})
+        content = client.get("api/personas/list", tag_id=tag_id)
+        assert len(content.main_table().rows) == 0
+
+        # a member of a sub-tag is found through its parent tag
+        content = client.get("api/tag/new")
+        subtable = content.named_table("tag")
+        subrow = subtable.rows[0]
+        subrow.name = "Black Pearl Gunners"
+        subrow.parent_id = tag_id
+        client.put("api/tag/{}", subrow.id, files={"tag": subtable.as_http_post_file()})
+        client.put("api/tags/{}/members", subrow.id, data={"add": gibbs_id})
+
+        content = client.get("api/personas/list", tag_id=tag_id)
+        assert len(content.main_table().rows) == 0
+        content = client.get(
+            "api/personas/list", tag_id=tag_id, include_descendants="true"
+        )
+        assert [row.id for row in content.main_table().rows] == [gibbs_id]
+
+        content = client.get("api/tags/list")
+        paths = [row.path_name for row in content.main_table().rows]
+        assert "Black Pearl Crew\u001CBlack Pearl Gunners" in paths
+
+        session.close()
+
+
 if __name__ == "__main__":
     srvparams = {"dburl": test_url(TEST_DATABASE), "modules": ["lcserver"]}
 
@@ -147,3 +258,4 @@ if __name__ == "__main__":
     test_crud_personas(srvparams)
     test_crud_bits(srvparams)
     test_basic_lists(srvparams)
+    test_tag_members(srvparams)
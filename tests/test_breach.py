@@ -0,0 +1,29 @@
+import os
+import importlib.util
+import pytest
+
+# breach is pure python; load it by path rather than through the lcserver
+# package which needs yenot and a database
+path = os.path.join(os.path.dirname(__file__), "..", "lcserver", "breach.py")
+spec = importlib.util.spec_from_file_location("lcserver_breach", path)
+breach = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(breach)
+
+
+def test_breach_filter(tmp_path):
+    corpus = ["password", "123456", "hunter2", "correct horse battery staple"]
+    path = tmp_path / "breach.bloom"
+    breach.build(path, [breach.sha1_digest(p) for p in corpus], len(corpus))
+
+    bf = breach.BreachFilter(path)
+    for password in corpus:
+        assert password in bf
+    assert "Rz8#qL2!vw0pKd" not in bf
+
+
+def test_breach_filter_magic(tmp_path):
+    path = tmp_path / "not.bloom"
+    path.write_bytes(b"\0" * 64)
+
+    with pytest.raises(ValueError):
+        breach.BreachFilter(path)
@@ -0,0 +1,35 @@
+from conftest import RecordingConnection
+
+
+def test_data_key_round_trip(contacts, dbconn, seeded):
+    keys = contacts.keys
+
+    token, dkid = keys.DataKeys(dbconn).encrypt(seeded["user_id"], b"yo ho ho")
+
+    # a fresh request unwraps the data key once for any number of decrypts
+    conn = RecordingConnection(dbconn)
+    dkeys = keys.DataKeys(conn)
+    for _ in range(3):
+        assert dkeys.decrypt(token, dkid) == b"yo ho ho"
+    assert len(conn.statements) == 1
+
+
+def test_data_key_per_owner(contacts, dbconn, seeded):
+    dkeys = contacts.keys.DataKeys(dbconn)
+
+    _, dkid1 = dkeys.encrypt(seeded["user_id"], b"one")
+    _, dkid2 = contacts.keys.DataKeys(dbconn).encrypt(seeded["user_id"], b"two")
+
+    assert dkid1 == dkid2
+
+
+def test_legacy_rotates_to_data_key(contacts, dbconn, seeded):
+    keys = contacts.keys
+    legacy, key_id = keys.manager.encrypt(b"doubloons")
+
+    dkeys = keys.DataKeys(dbconn)
+    token, dkid = dkeys.rotate(legacy, seeded["user_id"], None, key_id)
+
+    assert dkid is not None
+    assert dkeys.decrypt(token, dkid) == b"doubloons"
+    assert dkeys.rotate(token, seeded["user_id"], dkid) == (token, dkid)
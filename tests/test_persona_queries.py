@@ -0,0 +1,39 @@
+import pytest
+from conftest import RecordingConnection
+
+
+def test_persona_detail_single_query(contacts, dbconn, seeded):
+    conn = RecordingConnection(dbconn)
+
+    persona, bits = contacts._persona_detail(
+        conn, seeded["user_id"], seeded["persona_id"]
+    )
+
+    assert len(conn.statements) == 1
+    assert len(persona[1]) == 1
+    assert sorted(row.bit_type for row in bits[1]) == ["phone_numbers", "urls"]
+
+    urls = [row for row in bits[1] if row.bit_type == "urls"]
+    assert urls[0].bit_data["password"] == "queen-annes-revenge"
+
+
+def test_persona_detail_unshared(contacts, dbconn, seeded):
+    conn = RecordingConnection(dbconn)
+
+    with pytest.raises(contacts.api.UserError):
+        contacts._persona_detail(
+            conn, "00000000-0000-0000-0000-000000000000", seeded["persona_id"]
+        )
+
+    assert len(conn.statements) == 1
+
+
+def test_persona_detail_masked(contacts, dbconn, seeded):
+    persona, bits = contacts._persona_detail(
+        dbconn, seeded["user_id"], seeded["persona_id"], reveal=False
+    )
+
+    urls = [row for row in bits[1] if row.bit_type == "urls"]
+    assert urls[0].bit_data["has_password"] == True
+    assert "password" not in urls[0].bit_data
+    assert "password_enc" not in urls[0].bit_data
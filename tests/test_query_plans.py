@@ -0,0 +1,130 @@
+import json
+from conftest import RecordingConnection
+
+# Tables which grow with the data; a sequential scan of one of these in a hot
+# query means a missing index.
+LARGE_TABLES = {
+    "personas",
+    "persona_shares",
+    "tagpersona",
+    "tag_closure",
+    "email_addresses",
+    "phone_numbers",
+    "street_addresses",
+    "urls",
+}
+
+
+def _seq_scans(plan):
+    scans = []
+    if plan["Node Type"] == "Seq Scan":
+        scans.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        scans.extend(_seq_scans(child))
+    return scans
+
+
+def _explain(dbconn, statements):
+    """
+    Return the large tables sequentially scanned by the recorded statements.
+    With enable_seqscan off the planner still chooses a sequential scan when
+    there is no index to use, whatever the size of the test data.
+    """
+    cursor = dbconn.cursor()
+    cursor.execute("set local enable_seqscan=off")
+
+    scanned = []
+    for sql, params in statements:
+        for statement in sql.split(";\n"):
+            lines = [
+                line for line in statement.split("\n") if not line.startswith("--")
+            ]
+            statement = "\n".join(lines).strip()
+            if statement == "":
+                continue
+            cursor.execute(f"explain (format json) {statement}", params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scanned.extend(_seq_scans(plan[0]["Plan"]))
+    return [t for t in scanned if t in LARGE_TABLES]
+
+
+def test_persona_detail_plan(contacts, dbconn, seeded):
+    conn = RecordingConnection(dbconn)
+    contacts._persona_detail(conn, seeded["user_id"], seeded["persona_id"])
+
+    assert _explain(dbconn, conn.statements) == []
+
+
+def test_persona_search_refresh_plan(contacts, dbconn, seeded):
+    conn = RecordingConnection(dbconn)
+    contacts._refresh_persona_search(conn, seeded["persona_id"])
+
+    assert _explain(dbconn, conn.statements) == []
+
+
+def test_delete_persona_plan(contacts, dbconn, seeded):
+    conn = RecordingConnection(dbconn)
+    contacts._delete_persona(conn, seeded["persona_id"])
+
+    assert _explain(dbconn, conn.statements) == []
+
+
+TAG_ID = "00000000-0000-0000-0000-000000000000"
+
+
+def _recorded(dbconn, query, *args):
+    conn = RecordingConnection(dbconn)
+    query(conn, *args)
+    return conn.statements
+
+
+def test_personas_list_plans(contacts, dbconn, seeded):
+    uid = seeded["user_id"]
+    after = contacts._keyset_token("Teach, Edward", seeded["persona_id"])
+    searches = [
+        {"frag": "teach", "limit": 50},
+        {"frag": "teach", "order": "relevance", "limit": 50},
+        {"included": str(seeded["persona_id"])},
+        {"tag": TAG_ID},
+        {"tag": TAG_ID, "descendants": True},
+        {"after": after, "limit": 50},
+    ]
+
+    for kwargs in searches:
+        conn = RecordingConnection(dbconn)
+        contacts._personas_list(conn, uid, **kwargs)
+        assert _explain(dbconn, conn.statements) == [], kwargs
+
+
+def test_personas_typeahead_plan(contacts, dbconn, seeded):
+    query = contacts._personas_typeahead
+    statements = _recorded(dbconn, query, seeded["user_id"], "Tea", 10)
+
+    assert _explain(dbconn, statements) == []
+
+
+def test_lookup_plans(contacts, dbconn, seeded):
+    uid = seeded["user_id"]
+    number = contacts.normalize_phone("555-0100")
+    host_rev = contacts.url_host_reversed("https://revenge.example.com")
+
+    statements = []
+    statements += _recorded(dbconn, contacts._phone_lookup, uid, number)
+    statements += _recorded(dbconn, contacts._email_lookup, uid, ["a@example.com"])
+    statements += _recorded(dbconn, contacts._urls_lookup, uid, host_rev)
+
+    assert _explain(dbconn, statements) == []
+
+
+def test_report_plans(reports, dbconn, seeded):
+    uid = seeded["user_id"]
+
+    statements = []
+    statements += _recorded(dbconn, reports._address_list, TAG_ID)
+    statements += _recorded(dbconn, reports._address_list, TAG_ID, True)
+    statements += _recorded(dbconn, reports._passwords_due, uid, 30)
+    statements += _recorded(dbconn, reports._passwords_reused, uid)
+
+    assert _explain(dbconn, statements) == []
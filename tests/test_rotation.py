@@ -0,0 +1,57 @@
+import concurrent.futures as futures
+from conftest import UncommittedConnection
+
+
+def test_rotate_batch_legacy(contacts, dbconn, seeded):
+    from lcserver import rotation
+
+    keys = contacts.keys
+    legacy, key_id = keys.manager.encrypt(b"pieces of eight")
+
+    cursor = dbconn.cursor()
+    cursor.execute(
+        """
+update contacts.urls set password_enc=%(penc)s, password_key_id=%(kid)s,
+    data_key_id=null, password_fingerprint=null
+where id=%(id)s""",
+        {"penc": legacy, "kid": key_id, "id": seeded["url_id"]},
+    )
+    cursor.execute(
+        """
+insert into contacts.password_rotations (target_key_id, remaining)
+values (%(target)s, 0)
+returning id""",
+        {"target": keys.manager.current_key_id()},
+    )
+    job_id = cursor.fetchone()[0]
+
+    conn = UncommittedConnection(dbconn)
+    select = """
+select id, target_key_id, last_url_id
+from contacts.password_rotations
+where id=%(job)s"""
+    job = contacts.api.sql_1object(conn, select, {"job": job_id})
+
+    with futures.ThreadPoolExecutor(max_workers=2) as pool:
+        while rotation._rotate_batch(conn, pool, job, 2):
+            pass
+
+    cursor.execute(
+        """
+select password_enc, data_key_id, password_key_id, password_fingerprint
+from contacts.urls
+where id=%(id)s""",
+        {"id": seeded["url_id"]},
+    )
+    penc, dkid, kid, fingerprint = cursor.fetchone()
+    assert dkid is not None and kid is None
+    assert fingerprint is not None
+    assert keys.DataKeys(dbconn).decrypt(bytes(penc), dkid) == b"pieces of eight"
+
+    cursor.execute(
+        "select last_url_id, rotated from contacts.password_rotations where id=%(id)s",
+        {"id": job_id},
+    )
+    last_url_id, rotated = cursor.fetchone()
+    assert last_url_id is not None and last_url_id == job.last_url_id
+    assert rotated >= 1
@@ -0,0 +1,42 @@
+import pytest
+from conftest import RecordingConnection
+
+TAG_ID = "00000000-0000-0000-0000-000000000000"
+
+
+def _tag_ids(dbconn, persona_id):
+    cursor = dbconn.cursor()
+    cursor.execute(
+        "select tag_id::text from contacts.tagpersona where persona_id=%(p)s",
+        {"p": persona_id},
+    )
+    return sorted(r[0] for r in cursor.fetchall())
+
+
+def test_tag_deltas_idempotent(contacts, dbconn, seeded):
+    cursor = dbconn.cursor()
+    cursor.execute(
+        "insert into contacts.tags (name) values ('Pirates'), ('Navy') returning id::text"
+    )
+    pirates, navy = [r[0] for r in cursor.fetchall()]
+    pid = seeded["persona_id"]
+
+    for _ in range(2):
+        contacts._apply_tag_deltas(dbconn, [(pirates, pid), (navy, pid)], [])
+    assert _tag_ids(dbconn, pid) == sorted([pirates, navy])
+
+    for _ in range(2):
+        contacts._apply_tag_deltas(dbconn, [], [(navy, pid)])
+    assert _tag_ids(dbconn, pid) == [pirates]
+
+
+def test_update_persona_tags_bad_ids(contacts, dbconn, seeded):
+    conn = RecordingConnection(dbconn)
+    pid = str(seeded["persona_id"])
+
+    with pytest.raises(contacts.api.UserError):
+        contacts._update_persona_tags(conn, [("not-a-tag", pid)], [])
+    with pytest.raises(contacts.api.UserError):
+        contacts._update_persona_tags(conn, [], [(TAG_ID, "{not-a-persona}")])
+
+    assert conn.statements == []
@@ -0,0 +1,75 @@
+def test_tag_tree_depth(contacts, dbconn):
+    from lcserver import tags
+
+    cursor = dbconn.cursor()
+    parent = None
+    names = ["Ships", "Pirate", "Caribbean", "Brig", "Crew", "Cabin Boys"]
+    for name in names:
+        cursor.execute(
+            "insert into contacts.tags (name, parent_id) values (%(n)s, %(p)s) returning id",
+            {"n": name, "p": parent},
+        )
+        parent = cursor.fetchone()[0]
+
+    tags._invalidate_tree()
+    columns, rows = tags._tag_tree(dbconn)
+
+    deepest = [row for row in rows if row.name == "Cabin Boys"]
+    assert deepest[0].path_name == "\u001C".join(names)
+
+
+def test_tag_tree_cycle(contacts, dbconn):
+    from lcserver import tags
+
+    cursor = dbconn.cursor()
+    cursor.execute(
+        "insert into contacts.tags (name) values ('Flying Dutchman'), ('Ghost Ship') returning id"
+    )
+    dutchman, ghost = [r[0] for r in cursor.fetchall()]
+    update = "update contacts.tags set parent_id=%(p)s where id=%(t)s"
+    cursor.execute(update, {"p": ghost, "t": dutchman})
+    cursor.execute(update, {"p": dutchman, "t": ghost})
+
+    tags._invalidate_tree()
+    columns, rows = tags._tag_tree(dbconn)
+
+    cycle = sorted(row.path_name for row in rows if row.id in (dutchman, ghost))
+    assert cycle == ["Flying Dutchman", "Ghost Ship"]
+
+
+def _closure(dbconn, tag_ids):
+    cursor = dbconn.cursor()
+    cursor.execute(
+        """
+select ancestor_id, descendant_id, depth
+from contacts.tag_closure
+where descendant_id=any(%(t)s::uuid[])""",
+        {"t": tag_ids},
+    )
+    return sorted(cursor.fetchall())
+
+
+def test_tag_closure_cycle_resave(contacts, dbconn):
+    from lcserver import tags
+
+    cursor = dbconn.cursor()
+    cursor.execute(
+        "insert into contacts.tags (name) values ('Kraken'), ('Locker') returning id"
+    )
+    kraken, locker = [r[0] for r in cursor.fetchall()]
+    update = "update contacts.tags set parent_id=%(p)s where id=%(t)s"
+    cursor.execute(update, {"p": locker, "t": kraken})
+    cursor.execute(update, {"p": kraken, "t": locker})
+    # the legacy closure rows as loaded by migration 025
+    tags._update_tag_closure(dbconn, kraken)
+
+    # re-saving with the parent unchanged is not a new cycle
+    tags._raise_tag_cycle(dbconn, kraken, locker)
+    tags._update_tag_closure(dbconn, kraken)
+    assert len(_closure(dbconn, [kraken, locker])) == 4
+
+    cursor.execute(update, {"p": None, "t": kraken})
+    tags._update_tag_closure(dbconn, kraken)
+    assert _closure(dbconn, [kraken, locker]) == sorted(
+        [(kraken, kraken, 0), (locker, locker, 0), (kraken, locker, 1)]
+    )